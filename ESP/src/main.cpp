@@ -5,17 +5,26 @@
  * Core 1: uartTask     – Serial I/O → Command-Queue
  *
  * Raspi → ESP32:
- *   DD{mm}         Geradeaus  (+ vorwärts, – rückwärts)
- *   TA{deg}        Drehen     (+ im Uhrzeigersinn)
- *   HE             Endstop-Homing: rückwärts bis GPIO5 LOW, dann OK
+ *   DD{mm}[#id]    Geradeaus  (+ vorwärts, – rückwärts)
+ *   TA{deg}[#id]   Drehen     (+ im Uhrzeigersinn)
+ *   HE[#id]        Endstop-Homing: rückwärts bis GPIO5 LOW, dann OK
  *   ST             Sofort stoppen (interrupt, kein Queue)
  *   RS             Weiterfahren nach ST
+ *   CL             Abbruch: laufenden Befehl anhalten, wartende Befehle verwerfen
  *   SP{x};{y};{t}  Odometrie setzen (kein Ack)
+ *   PS{ms}         Pose-Stream: alle ms Millisekunden Fortschritt melden (0 = aus)
  *
  * ESP32 → Raspi:
- *   OK             Befehl vollständig ausgeführt
- *   INTERRUPTED    Befehl durch ST abgebrochen
- *   ERR            Unbekannter Befehl
+ *   OK[#id]            Befehl vollständig ausgeführt
+ *   INTERRUPTED[#id]   Befehl durch ST (im PAUSED) oder CL abgebrochen/verworfen;
+ *                      wartende Befehle werden in beiden Fällen mit verworfen
+ *   ERR                Unbekannter Befehl
+ *   P{id};{r};{l}      Schritte rechts/links seit Start des laufenden Befehls
+ *                      (nur mit PS, während der Fahrt und direkt vor INTERRUPTED)
+ *
+ * Mit #id dürfen mehrere Fahrbefehle gleichzeitig unterwegs sein: sie landen in
+ * cmdQueue und werden ohne Pause nacheinander abgefahren, jede Quittung trägt
+ * die id ihres Befehls.
  */
 
 #include <Arduino.h>
@@ -44,13 +53,20 @@ AccelStepper stepperR(AccelStepper::DRIVER, STEP_R, DIR_R);
 AccelStepper stepperL(AccelStepper::DRIVER, STEP_L, DIR_L);
 
 // ── Command queue ─────────────────────────────────────────────────────────
-struct Cmd { char type; int32_t val; };  // type: 'D'=DD, 'T'=TA, 'H'=HE
+struct Cmd { char type; int32_t val; uint16_t id; };  // type: 'D'=DD, 'T'=TA, 'H'=HE; id 0 = ohne id
 static QueueHandle_t cmdQueue;
 
 // ── Shared ────────────────────────────────────────────────────────────────
 static SemaphoreHandle_t serialMtx;
 static volatile bool stopFlag   = false;
 static volatile bool resumeFlag = false;
+static volatile bool abortFlag  = false;
+static volatile bool motionIdle = true;   // stepperTask steht in IDLE
+
+// Pose-Stream: Fortschritt des laufenden Befehls relativ zu seiner Startposition
+static volatile uint32_t poseIntervalMs = 0;   // 0 = aus
+static volatile uint16_t activeId = 0;
+static volatile long startPosR = 0, startPosL = 0;
 
 static void serialPrintln(const char* msg) {
     if (xSemaphoreTake(serialMtx, pdMS_TO_TICKS(50)) == pdTRUE) {
@@ -60,12 +76,41 @@ static void serialPrintln(const char* msg) {
     }
 }
 
+// Quittung mit optionaler Befehls-id: "OK" bzw. "OK#12"
+static void sendAck(const char* msg, uint16_t id) {
+    if (id == 0) {
+        serialPrintln(msg);
+        return;
+    }
+    char buf[24];
+    snprintf(buf, sizeof(buf), "%s#%u", msg, (unsigned)id);
+    serialPrintln(buf);
+}
+
+// Fortschritt des laufenden Befehls: "P12;-830;812"
+static void sendProgress(uint16_t id) {
+    char buf[40];
+    snprintf(buf, sizeof(buf), "P%u;%ld;%ld", (unsigned)id,
+             stepperR.currentPosition() - startPosR,
+             stepperL.currentPosition() - startPosL);
+    serialPrintln(buf);
+}
+
+// Wartende Befehle verwerfen – sie wurden von einer Pose aus geplant, die nach
+// einem Abbruch nicht mehr stimmt
+static void dropQueued() {
+    Cmd dropped;
+    while (xQueueReceive(cmdQueue, &dropped, 0) == pdTRUE) {
+        sendAck("INTERRUPTED", dropped.id);
+    }
+}
+
 // ── Core 0: Stepper-Task ──────────────────────────────────────────────────
 //
 //  IDLE ──DD/TA──► MOVING ──ST──► STOPPING ──stillstand──► PAUSED
 //                                                              │
 //                  ◄─────────────────── RS ───────────────────┘
-//  PAUSED ──ST──► IDLE  (sendet INTERRUPTED)
+//  PAUSED ──ST──► IDLE  (sendet INTERRUPTED, verwirft cmdQueue)
 //
 //  IDLE ──HE──► HOMING ──endstop LOW──► HOMING_STOP ──stillstand──► IDLE (OK)
 //
@@ -78,31 +123,39 @@ static constexpr long MIN_HOMING_STEPS = 100;  // ~20mm Anti-Bounce vor Endstop-
 static void stepperTask(void*) {
     MotionState state = MotionState::IDLE;
     Cmd cmd = {};
+    uint16_t curId = 0;   // id des laufenden Befehls
 
     while (true) {
-        TickType_t wait = (state == MotionState::IDLE) ? portMAX_DELAY : 0;
-        if (xQueueReceive(cmdQueue, &cmd, wait) == pdTRUE) {
-            if (state == MotionState::IDLE) {
-                if (cmd.type == 'D') {
-                    long s = lroundf(cmd.val * STEPS_PER_MM);
-                    stepperR.move(s);
-                    stepperL.move(lroundf(s * MAX_SPEED_L / MAX_SPEED_R));
-                    state = MotionState::MOVING;
-                } else if (cmd.type == 'T') {
-                    long s = lroundf(cmd.val * STEPS_PER_DEG);
-                    stepperR.move(-s);
-                    stepperL.move(lroundf(s * MAX_SPEED_L / MAX_SPEED_R));
-                    state = MotionState::MOVING;
-                } else if (cmd.type == 'H') {
-                    // Langsam rückwärts bis Endstop – Pin-Status zuerst senden
-                    serialPrintln(digitalRead(ENDSTOP_PIN) == LOW ? "ES:LOW" : "ES:HIGH");
-                    stepperR.setMaxSpeed(HOMING_SPEED);
-                    stepperL.setMaxSpeed(HOMING_SPEED * MAX_SPEED_L / MAX_SPEED_R);
-                    stepperR.move(-100000L);
-                    stepperL.move(lroundf(-100000.0f * MAX_SPEED_L / MAX_SPEED_R));
-                    homingStartPosR = stepperR.currentPosition();
-                    state = MotionState::HOMING;
-                }
+        motionIdle = (state == MotionState::IDLE);
+        // Nächsten Befehl nur im IDLE annehmen – der Rest wartet in der Queue.
+        // Erst peeken, dann motionIdle löschen, dann entnehmen: enqueueCmd sieht so
+        // nie "idle + Queue leer", solange ein Befehl schon angenommen ist.
+        if (state == MotionState::IDLE && xQueuePeek(cmdQueue, &cmd, portMAX_DELAY) == pdTRUE) {
+            motionIdle = false;
+            xQueueReceive(cmdQueue, &cmd, 0);
+            curId = cmd.id;
+            startPosR = stepperR.currentPosition();
+            startPosL = stepperL.currentPosition();
+            activeId  = curId;
+            if (cmd.type == 'D') {
+                long s = lroundf(cmd.val * STEPS_PER_MM);
+                stepperR.move(s);
+                stepperL.move(lroundf(s * MAX_SPEED_L / MAX_SPEED_R));
+                state = MotionState::MOVING;
+            } else if (cmd.type == 'T') {
+                long s = lroundf(cmd.val * STEPS_PER_DEG);
+                stepperR.move(-s);
+                stepperL.move(lroundf(s * MAX_SPEED_L / MAX_SPEED_R));
+                state = MotionState::MOVING;
+            } else if (cmd.type == 'H') {
+                // Langsam rückwärts bis Endstop – Pin-Status zuerst senden
+                serialPrintln(digitalRead(ENDSTOP_PIN) == LOW ? "ES:LOW" : "ES:HIGH");
+                stepperR.setMaxSpeed(HOMING_SPEED);
+                stepperL.setMaxSpeed(HOMING_SPEED * MAX_SPEED_L / MAX_SPEED_R);
+                stepperR.move(-100000L);
+                stepperL.move(lroundf(-100000.0f * MAX_SPEED_L / MAX_SPEED_R));
+                homingStartPosR = stepperR.currentPosition();
+                state = MotionState::HOMING;
             }
         }
 
@@ -115,8 +168,24 @@ static void stepperTask(void*) {
                 stepperL.setCurrentPosition(stepperL.currentPosition());
                 state = MotionState::PAUSED;
             } else if (state == MotionState::PAUSED) {
+                dropQueued();
+                state = MotionState::IDLE;
+                if (poseIntervalMs) sendProgress(curId);
+                sendAck("INTERRUPTED", curId);
+            }
+        }
+
+        if (abortFlag) {
+            abortFlag = false;
+            dropQueued();
+            if (state != MotionState::IDLE) {
+                stepperR.setCurrentPosition(stepperR.currentPosition());
+                stepperL.setCurrentPosition(stepperL.currentPosition());
+                stepperR.setMaxSpeed(MAX_SPEED_R);
+                stepperL.setMaxSpeed(MAX_SPEED_L);
                 state = MotionState::IDLE;
-                serialPrintln("INTERRUPTED");
+                if (poseIntervalMs) sendProgress(curId);
+                sendAck("INTERRUPTED", curId);
             }
         }
 
@@ -139,7 +208,7 @@ static void stepperTask(void*) {
                     state = MotionState::PAUSED;
                 } else {
                     state = MotionState::IDLE;
-                    serialPrintln("OK");
+                    sendAck("OK", curId);
                 }
             }
         }
@@ -162,16 +231,30 @@ static void stepperTask(void*) {
                 stepperR.setMaxSpeed(MAX_SPEED_R);
                 stepperL.setMaxSpeed(MAX_SPEED_L);
                 state = MotionState::IDLE;
-                serialPrintln("OK");
+                sendAck("OK", curId);
             }
         }
     }
 }
 
 // ── Core 1: UART-Task ─────────────────────────────────────────────────────
+
+// Befehl einreihen. Ein altes ST darf nur verworfen werden, wenn der Befehl
+// sofort startet – sonst gehört es zur laufenden Fahrt.
+static void enqueueCmd(Cmd& cmd) {
+    if (motionIdle && uxQueueMessagesWaiting(cmdQueue) == 0) {
+        stopFlag  = false;
+        abortFlag = false;
+    }
+    if (xQueueSend(cmdQueue, &cmd, pdMS_TO_TICKS(200)) != pdTRUE) {
+        sendAck("INTERRUPTED", cmd.id);
+    }
+}
+
 static void uartTask(void*) {
     String buf;
     buf.reserve(32);
+    uint32_t lastPoseMs = 0;
 
     while (true) {
         while (Serial.available()) {
@@ -180,27 +263,33 @@ static void uartTask(void*) {
                 buf.trim();
                 if (buf.length() >= 2) {
                     Cmd cmd = {};
+                    int hash = buf.indexOf('#');
+                    if (hash >= 0) {
+                        cmd.id = (uint16_t)buf.substring(hash + 1).toInt();
+                        buf = buf.substring(0, hash);
+                    }
                     if (buf == "ST") {
                         stopFlag = true;
                     } else if (buf == "RS") {
                         resumeFlag = true;
+                    } else if (buf == "CL") {
+                        abortFlag = true;
                     } else if (buf == "ES") {
                         // Debug: Endstop-Status zurückmelden
                         serialPrintln(digitalRead(ENDSTOP_PIN) == LOW ? "ENDSTOP:LOW" : "ENDSTOP:HIGH");
                     } else if (buf == "HE") {
                         cmd.type = 'H';
-                        stopFlag = false;
-                        xQueueSend(cmdQueue, &cmd, pdMS_TO_TICKS(200));
+                        enqueueCmd(cmd);
                     } else if (buf.startsWith("DD")) {
                         cmd.type = 'D';
                         cmd.val  = (int32_t)buf.substring(2).toInt();
-                        stopFlag = false;
-                        xQueueSend(cmdQueue, &cmd, pdMS_TO_TICKS(200));
+                        enqueueCmd(cmd);
                     } else if (buf.startsWith("TA")) {
                         cmd.type = 'T';
                         cmd.val  = (int32_t)buf.substring(2).toInt();
-                        stopFlag = false;
-                        xQueueSend(cmdQueue, &cmd, pdMS_TO_TICKS(200));
+                        enqueueCmd(cmd);
+                    } else if (buf.startsWith("PS")) {
+                        poseIntervalMs = (uint32_t)max(0L, buf.substring(2).toInt());
                     } else if (buf.startsWith("SP")) {
                         // Odometrie-Sync – kein Ack nötig
                     } else {
@@ -213,6 +302,10 @@ static void uartTask(void*) {
                 if (buf.length() > 64) buf = "";
             }
         }
+        if (poseIntervalMs && !motionIdle && millis() - lastPoseMs >= poseIntervalMs) {
+            lastPoseMs = millis();
+            sendProgress(activeId);
+        }
         vTaskDelay(pdMS_TO_TICKS(1));
     }
 }
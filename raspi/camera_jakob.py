@@ -5,6 +5,8 @@ import time
 from dataclasses import dataclass
 from typing import Dict, List, Optional, Tuple
 
+from modules.frame_store import FrameStore
+
 @dataclass
 class CratePosition:
     id: int
@@ -30,12 +32,21 @@ class ArUcoVisionPipeline:
         self.aruco_detector = cv2.aruco.ArucoDetector(self.aruco_dict, self.aruco_params)
         
         self.picam2 = None
+        self.frames: Optional[FrameStore] = None
+        self._generation = 0
         self.camera_matrix = None
         self.dist_coeffs = None
         
         self.tracked_crates: Dict[int, CratePosition] = {}
         
     def setup_camera(self):
+        # Läuft main.py schon, dessen Bilder mitlesen statt die Kamera zu blockieren
+        try:
+            self.frames = FrameStore.attach()
+            print("Kamera von main.py (Frame-Store)")
+            return
+        except FileNotFoundError:
+            pass
         self.picam2 = Picamera2()
         config = self.picam2.create_preview_configuration(
             main={"size": self.camera_resolution, "format": "RGB888"}
@@ -66,6 +77,11 @@ class ArUcoVisionPipeline:
             self.dist_coeffs = np.zeros((5, 1), dtype=np.float32)
     
     def capture_frame(self) -> np.ndarray:
+        if self.frames:
+            while (frame := self.frames.wait_newer(self._generation)) is None:
+                pass
+            self._generation = frame.generation
+            return self.frames.latest_bgr()
         frame = self.picam2.capture_array()
         return cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
     
@@ -164,6 +180,8 @@ class ArUcoVisionPipeline:
         return self.tracked_crates.get(crate_id)
     
     def cleanup(self):
+        if self.frames:
+            self.frames.close()
         if self.picam2:
             self.picam2.stop()
             print("Kamera gestoppt")
@@ -3,6 +3,10 @@
 Kamera-Livestream mit ArUco-Erkennung – wie camera_jakob.py, aber per HTTP MJPEG.
 Aufruf: python3 raspi/camera_stream.py
 Stream öffnen: http://192.168.0.78:8080
+
+Läuft main.py, werden dessen Bilder aus dem Frame-Store (Shared Memory) gelesen
+statt die CSI-Kamera ein zweites Mal zu öffnen – dann mit dem Takt von main.py
+(Leerlauf ~2 fps, vor Kamera-Aktionen 30 fps).
 """
 
 import io
@@ -13,6 +17,8 @@ import numpy as np
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from picamera2 import Picamera2
 
+from modules.frame_store import FrameStore
+
 MARKER_SIZE_MM   = 40.0
 CAMERA_RES       = (1280, 720)
 CRATE_IDS        = {36, 47, 41}
@@ -56,8 +62,18 @@ def _process_frame(frame_bgr: np.ndarray) -> np.ndarray:
     return vis
 
 
-def _capture_loop():
-    global _latest_jpeg
+def _frames_from_store(store: FrameStore):
+    print("Kamera von main.py (Frame-Store)")
+    generation = 0
+    while True:
+        frame = store.wait_newer(generation)
+        if frame is None:
+            continue
+        generation = frame.generation
+        yield store.latest_bgr()
+
+
+def _frames_from_camera():
     picam2 = Picamera2()
     config = picam2.create_preview_configuration(
         main={"size": CAMERA_RES, "format": "RGB888"}
@@ -69,16 +85,26 @@ def _capture_loop():
     try:
         while True:
             frame_rgb = picam2.capture_array()
-            frame_bgr = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
-            vis       = _process_frame(frame_bgr)
-            ok, buf   = cv2.imencode('.jpg', vis, [cv2.IMWRITE_JPEG_QUALITY, 75])
-            if ok:
-                with _frame_lock:
-                    _latest_jpeg = buf.tobytes()
+            yield cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
     finally:
         picam2.stop()
 
 
+def _capture_loop():
+    global _latest_jpeg
+    try:
+        store = FrameStore.attach()
+    except FileNotFoundError:
+        store = None
+    frames = _frames_from_store(store) if store else _frames_from_camera()
+    for frame_bgr in frames:
+        vis     = _process_frame(frame_bgr)
+        ok, buf = cv2.imencode('.jpg', vis, [cv2.IMWRITE_JPEG_QUALITY, 75])
+        if ok:
+            with _frame_lock:
+                _latest_jpeg = buf.tobytes()
+
+
 class _Handler(BaseHTTPRequestHandler):
     def log_message(self, *_):
         pass  # kein HTTP-Log-Spam
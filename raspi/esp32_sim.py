@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+ESP32-Simulator – serieller Stand-in für den Fahr-Controller (ESP/src/main.cpp).
+
+Legt ein Pseudo-Terminal an und spricht dort dasselbe Zeilenprotokoll wie die
+Firmware (DD/TA/HE mit #id, ST, RS, CL, SP, PS, ES). Fahrzeiten werden aus den
+Firmware-Konstanten abgeschätzt und mit --speed beschleunigt.
+
+Aufruf:
+    python3 raspi/esp32_sim.py [--speed 10]
+
+Dann den ausgegebenen Pfad als Port verwenden, z.B.:
+    ESP32(port='/dev/pts/5')
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import pty
+import tty
+
+# ── Firmware-Konstanten (ESP/src/main.cpp) ────────────────────────────────
+STEPS_PER_REV = 730.0
+WHEEL_DIAM_MM = 48.0
+WHEELBASE_MM  = 226.0
+STEPS_PER_MM  = STEPS_PER_REV / (WHEEL_DIAM_MM * math.pi)
+STEPS_PER_DEG = WHEELBASE_MM * math.pi / 360.0 * STEPS_PER_MM
+MAX_SPEED     = 1500.0   # steps/s
+LEFT_RATIO    = 1465.0 / 1500.0
+HOMING_SPEED  = 400.0    # steps/s
+QUEUE_DEPTH   = 8
+
+
+class SimESP32:
+    def __init__(self, fd: int, speed: float):
+        self.fd = fd
+        self.speed = speed
+        self.queue: asyncio.Queue[tuple[str, int, int]] = asyncio.Queue(QUEUE_DEPTH)
+        self.paused = asyncio.Event()
+        self.aborted = False
+        self.current: tuple[str, int, int] | None = None
+        self.progress = 0.0        # Anteil des laufenden Befehls (0..1)
+        self.pose_interval = 0.0   # s, 0 = kein Pose-Stream
+
+    def send(self, msg: str):
+        print(f"  ← {msg}")
+        os.write(self.fd, f"{msg}\r\n".encode())
+
+    def ack(self, msg: str, cmd_id: int):
+        self.send(f"{msg}#{cmd_id}" if cmd_id else msg)
+
+    def send_progress(self):
+        kind, val, cmd_id = self.current
+        if kind == 'D':
+            r = val * STEPS_PER_MM * self.progress
+            l = r * LEFT_RATIO
+        elif kind == 'T':
+            l = val * STEPS_PER_DEG * self.progress * LEFT_RATIO
+            r = -val * STEPS_PER_DEG * self.progress
+        else:
+            r = -1000.0 * STEPS_PER_MM * self.progress
+            l = r * LEFT_RATIO
+        # Nicht ausgeben – bei 50 Hz würde das die Konsole fluten
+        os.write(self.fd, f"P{cmd_id};{round(r)};{round(l)}\r\n".encode())
+
+    async def pose_task(self):
+        while True:
+            await asyncio.sleep(self.pose_interval or 0.05)
+            if self.pose_interval and self.current:
+                self.send_progress()
+
+    def duration(self, kind: str, val: int) -> float:
+        if kind == 'D':
+            steps = abs(val) * STEPS_PER_MM
+        elif kind == 'T':
+            steps = abs(val) * STEPS_PER_DEG
+        else:
+            return 1000.0 / STEPS_PER_MM / HOMING_SPEED   # ~1 m bis zur Wand
+        return steps / MAX_SPEED
+
+    async def stepper_task(self):
+        while True:
+            self.current = await self.queue.get()
+            kind, val, cmd_id = self.current
+            total = remaining = self.duration(kind, val) / self.speed
+            self.progress = 0.0
+            self.aborted = False
+            while remaining > 0 and not self.aborted:
+                if self.paused.is_set():
+                    await asyncio.sleep(0.005)
+                    continue
+                step = min(remaining, 0.01)
+                await asyncio.sleep(step)
+                remaining -= step
+                self.progress = 1.0 - max(remaining, 0.0) / total
+            if not self.aborted:
+                self.ack("OK", cmd_id)
+            self.current = None
+
+    def interrupt(self):
+        self.paused.clear()
+        self.aborted = True
+        if self.pose_interval:
+            self.send_progress()
+        self.ack("INTERRUPTED", self.current[2])
+
+    def drop_queued(self):
+        while not self.queue.empty():
+            self.ack("INTERRUPTED", self.queue.get_nowait()[2])
+
+    def handle(self, line: str):
+        cmd, _, tag = line.partition('#')
+        cmd_id = int(tag) if tag.isdigit() else 0
+        if cmd == 'ST':
+            if self.current and self.paused.is_set():
+                self.drop_queued()
+                self.interrupt()
+            elif self.current:
+                self.paused.set()
+        elif cmd == 'RS':
+            self.paused.clear()
+        elif cmd == 'CL':
+            self.drop_queued()
+            if self.current:
+                self.interrupt()
+        elif cmd == 'ES':
+            self.send("ENDSTOP:HIGH")
+        elif cmd.startswith('PS'):
+            self.pose_interval = max(0, int(cmd[2:] or 0)) / 1000.0
+        elif cmd.startswith('SP'):
+            pass
+        elif cmd == 'HE' or cmd[:2] in ('DD', 'TA'):
+            kind = {'HE': 'H', 'DD': 'D', 'TA': 'T'}[cmd[:2]]
+            try:
+                self.queue.put_nowait((kind, int(cmd[2:] or 0), cmd_id))
+            except (asyncio.QueueFull, ValueError):
+                self.ack("INTERRUPTED", cmd_id)
+        else:
+            self.send("ERR")
+
+    async def uart_task(self):
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue[bytes] = asyncio.Queue()
+        loop.add_reader(self.fd, lambda: chunks.put_nowait(os.read(self.fd, 256)))
+        buf = b''
+        while True:
+            buf += await chunks.get()
+            while b'\n' in buf:
+                raw, buf = buf.split(b'\n', 1)
+                line = raw.decode(errors='replace').strip()
+                if line:
+                    print(f"  → {line}")
+                    self.handle(line)
+
+
+async def main():
+    p = argparse.ArgumentParser(description='ESP32-Simulator auf einem Pseudo-Terminal')
+    p.add_argument('--speed', type=float, default=1.0, help='Zeitraffer-Faktor (default: 1)')
+    args = p.parse_args()
+
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    print(f"ESP32-Simulator auf {os.ttyname(slave)}  (Zeitraffer ×{args.speed:g})")
+
+    sim = SimESP32(master, args.speed)
+    await asyncio.gather(sim.stepper_task(), sim.uart_task(), sim.pose_task())
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nBeendet")
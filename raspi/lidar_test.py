@@ -45,7 +45,7 @@ def _in_cone(angle, center_deg, half_deg):
 def classify(scan, x, y, theta, direction):
     """direction=0 (drehen) → Vollkreis. +1/-1 → 45°-Kegel vorne/hinten."""
     hits = []
-    for angle, distance in scan:
+    for angle, distance in zip(scan.angle.tolist(), scan.distance.tolist()):
         if distance < MIN_DIST or distance > STOP_DIST:
             continue
 
@@ -81,15 +81,17 @@ def main():
     print("─" * 55)
 
     last_state  = None
+    last_seq    = 0
     scan_count  = 0
     last_fps    = time.time()
 
     try:
         while True:
-            scan = lidar.get_latest_scan()
+            scan = lidar.wait_for_scan(last_seq, timeout=1.0)
             if scan is None:
-                time.sleep(0.01)
+                print(f"\r  {YELLOW}kein neuer Scan seit 1 s{RESET}   ", end='', flush=True)
                 continue
+            last_seq = scan.seq
 
             scan_count += 1
             hits = classify(scan, ROBOT_X, ROBOT_Y, ROBOT_THT, DIRECTION)
@@ -110,8 +112,8 @@ def main():
             pts_str = f"{len(hits)} Treffer" if hits else "–"
             bar = (RED + "●" + RESET) if detected else (GREEN + "○" + RESET)
             print(
-                f"\r  {bar}  Punkte: {len(scan):4d}  Treffer: {len(hits):2d}  "
-                f"fps: {fps:4.1f}   ",
+                f"\r  {bar}  Scan #{scan.seq:5d}  Punkte: {len(scan):4d}  Treffer: {len(hits):2d}  "
+                f"fps: {fps:4.1f}  Alter: {(time.monotonic() - scan.stamp) * 1000:3.0f} ms   ",
                 end='', flush=True
             )
 
@@ -123,8 +125,6 @@ def main():
                 )
                 print(f"\n  {YELLOW}nächste Punkte:{RESET} {details}", end='', flush=True)
 
-            time.sleep(0.02)
-
     except KeyboardInterrupt:
         print(f"\n\n{CYAN}Beende …{RESET}")
     finally:
@@ -9,17 +9,22 @@ import argparse
 import asyncio
 import logging
 import signal
-import copy
 import RPi.GPIO as GPIO
+from collections import deque
 from enum import Enum
-from time import time
+from time import time, monotonic
 
 from modules.task import Task
+from modules.tactic import compile_tactics, optimize, plan_report
 from modules.camera import Camera
+from modules.frame_store import FrameStore
+from modules.vision_worker import VisionWorker
 from modules.esp32 import ESP32
-from modules.servos import Servos
+from modules.servos import Servos, ServoTelemetry
 from modules.gripper import Gripper
 from modules.lidar import Lidar
+from modules import telemetry
+from modules.telemetry import TelemetryServer
 
 PIN_PULLCORD = 22   # Pull-Up: LOW = Schnur drin, HIGH-Flanke = Start
 
@@ -63,24 +68,45 @@ class State(Enum):
     DONE    = 'done'
 
 
-# ── Log-Handler: schreibt Log-Zeilen in eine asyncio.Queue ────────────────
-class _QueueLogHandler(logging.Handler):
-    def __init__(self, queue: asyncio.Queue):
+# ── Log-Handler: sammelt Log-Zeilen für den Client ──────────────────────
+class _LogRing(logging.Handler):
+    """Begrenzter Puffer der letzten Log-Zeilen, thread-safe (emit kommt auch aus
+    Lidar-/Kamera-Threads). Ist er voll, fällt die älteste Zeile weg und wird gezählt."""
+    SIZE = 500
+
+    def __init__(self, size: int = SIZE):
         super().__init__()
-        self.queue = queue
+        self.lines: deque[str] = deque(maxlen=size)
+        self.dropped = 0
         self.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s',
                                             datefmt='%H:%M:%S'))
 
     def emit(self, record):
+        # handle() hält self.lock bereits
         try:
-            self.queue.put_nowait(self.format(record))
+            line = self.format(record)
         except Exception:
-            pass
+            return
+        if len(self.lines) == self.lines.maxlen:
+            self.dropped += 1
+        self.lines.append(line)
+
+    def take(self) -> tuple[list[str], int]:
+        """Alle wartenden Zeilen und die Zahl der seitdem verworfenen abholen."""
+        with self.lock:
+            lines = list(self.lines)
+            self.lines.clear()
+            dropped, self.dropped = self.dropped, 0
+        return lines, dropped
 
 
 # ── Haupt-Controller ──────────────────────────────────────────────────────
 class Robot:
-    def __init__(self, team: str):
+    LOG_TICK        = 0.1         # s  Log-Zeilen sammeln und einmal pro Takt senden
+    LOG_BUFFER_MAX  = 64 * 1024   # B  Sendepuffer, ab dem Log-Zeilen verworfen werden
+    SEND_BUFFER_MAX = 1 << 20     # B  Sendepuffer, ab dem der Client als tot gilt
+
+    def __init__(self, team: str, vision_process: bool = False):
         GPIO.setmode(GPIO.BCM)
         GPIO.setup(PIN_PULLCORD, GPIO.IN, pull_up_down=GPIO.PUD_UP)
 
@@ -90,26 +116,39 @@ class Robot:
         )
         self.logger = logging.getLogger('eurobot')
 
-        # Log-Queue: Hintergrund-Task streamt Einträge zum Client
-        self._log_queue: asyncio.Queue = asyncio.Queue()
-        self.logger.addHandler(_QueueLogHandler(self._log_queue))
+        # Log-Ring: Hintergrund-Task streamt Einträge gesammelt zum Client.
+        # Am Root-Logger, damit auch modules.* (Lidar, Kamera, Servos …) ankommen
+        self._log_ring = _LogRing()
+        logging.getLogger().addHandler(self._log_ring)
 
         # Zustand
         self.state      = State.IDLE
         self.team       = team
         self.tactic_num = 1
+        self.optimize   = False   # Fahrsegmente vor dem Start zusammenfassen (opt on|off)
         self._game_task: asyncio.Task | None = None
         self._writer:    asyncio.StreamWriter | None = None
 
+        # Taktiken einmal für beide Farben kompilieren – Fehler vor dem Scharfschalten
+        self.programs, self.tactic_errors = compile_tactics(TACTICS)
+        for n, err in self.tactic_errors.items():
+            self.log(f"Warning: Taktik {n} ungültig – {err}")
+
         # Hardware
         self.esp32   = ESP32()
         self.servos  = Servos()
         self.gripper = Gripper(self.servos)
         self.lidar   = Lidar()
-        self.camera  = Camera()
+        # camera_stream.py liest über den Frame-Store mit; --vision-process: eigener Prozess/Kern
+        camera_cls   = VisionWorker if vision_process else Camera
+        self.camera  = camera_cls(share=FrameStore.DEFAULT_NAME)
+
+        # Binärer Status für beliebig viele Zuhörer (telemetry_view.py), unabhängig von :5001
+        self.telemetry_server = TelemetryServer(self._telemetry_frame, HOST)
 
         if not self.lidar.start_scanning():
             self.log("Warning: Lidar nicht gestartet")
+        self.servos.telemetry.start()
         self.camera.start()
 
         self.log(f"Bereit. Team: {self.team}")
@@ -123,10 +162,15 @@ class Robot:
     # ── Senden an Client ──────────────────────────────────────────────────
 
     async def _send(self, line: str):
-        if self._writer and not self._writer.is_closing():
+        """Zeile an den Client – ohne auf drain() zu warten, ein langsamer Client bremst nichts."""
+        writer = self._writer
+        if writer and not writer.is_closing():
+            if writer.transport.get_write_buffer_size() > self.SEND_BUFFER_MAX:
+                self.logger.warning("Client liest nicht mehr – Verbindung getrennt")
+                writer.close()
+                return
             try:
-                self._writer.write((line.rstrip() + '\n').encode())
-                await self._writer.drain()
+                writer.write((line.rstrip() + '\n').encode())
             except Exception:
                 pass
 
@@ -140,16 +184,54 @@ class Robot:
         lines = [
             f"state    {self.state.value}",
             f"team     {self.team}",
-            f"tactic   {self.tactic_num}",
+            f"tactic   {self.tactic_num}{'  (optimiert)' if self.optimize else ''}",
             f"pos      x={self.esp32.x:.0f} y={self.esp32.y:.0f} θ={self.esp32.theta:.1f}°",
-            f"lidar    {'ok' if self.lidar.is_running() else 'FEHLT'}",
+            f"lidar    {self._lidar_status()}",
+            f"servos   {self._servo_status()}",
             f"pullcord {'gezogen' if GPIO.input(PIN_PULLCORD) == GPIO.HIGH else 'drin'}",
+            f"telem    {len(self.telemetry_server.subscribers)} Clients auf :{self.telemetry_server.port}",
         ]
         await self._send("─── Status " + "─" * 30)
         for l in lines:
             await self._send("  " + l)
         await self._send("─" * 41)
 
+    def _lidar_status(self) -> str:
+        if not self.lidar.is_running():
+            return 'FEHLT'
+        scan = self.lidar.snapshot()
+        if scan is None:
+            return 'ok (noch kein Scan)'
+        return f"ok (Scan #{scan.seq}, {(monotonic() - scan.stamp) * 1000:.0f} ms alt)"
+
+    def _servo_status(self) -> str:
+        snap = self.servos.telemetry.snapshot()
+        fresh = monotonic() - snap.stamp < 1.0
+        if not fresh.any():
+            return 'keine Telemetrie'
+        t = ServoTelemetry
+        temps = snap.data[fresh, t.TEMP]
+        volts = snap.data[fresh, t.VOLT]
+        bus = self.servos.bus_stats()
+        return (f"{int(fresh.sum())}/{len(snap.ids)} ok, max {temps.max()} °C, "
+                f"{volts.min() / 10:.1f} V, Last max {abs(snap.data[fresh, t.LOAD]).max() / 10:.0f} %, "
+                f"Bus {bus['timeouts']} Timeouts/{bus['retries']} Retries, {bus['latency_ms']} ms")
+
+    def _telemetry_frame(self, seq: int) -> bytes:
+        scan = self.lidar.snapshot()
+        flags = telemetry.F_YELLOW if self.team == 'yellow' else 0
+        if self.lidar.is_running():
+            flags |= telemetry.F_LIDAR_OK
+        if self.lidar.stop_motor:
+            flags |= telemetry.F_LIDAR_STOP
+        if GPIO.input(PIN_PULLCORD) == GPIO.HIGH:
+            flags |= telemetry.F_PULLCORD
+        return telemetry.encode(
+            seq, self.state.value, flags, (self.esp32.x, self.esp32.y, self.esp32.theta),
+            scan.seq if scan else 0, self.lidar.hits,
+            self.servos.telemetry.snapshot(), self.camera.getTag(),
+        )
+
     # ── Befehls-Dispatcher ────────────────────────────────────────────────
 
     async def handle_cmd(self, raw: str):
@@ -179,10 +261,30 @@ class Robot:
                 if n not in TACTICS:
                     await self._err(f"Taktik {n} nicht vorhanden. Verfügbar: {list(TACTICS)}")
                     return
+                if n in self.tactic_errors:
+                    await self._err(f"Taktik {n} ungültig: {self.tactic_errors[n]}")
+                    return
                 self.tactic_num = n
                 self.log(f"Taktik: {self.tactic_num}")
                 await self._ok(f"tactic={self.tactic_num}")
 
+            case 'opt':
+                if not args or args[0] not in ('on', 'off'):
+                    await self._err("Verwendung: opt on|off")
+                    return
+                self.optimize = args[0] == 'on'
+                self.log(f"Optimierung: {args[0]}")
+                await self._ok(f"opt={args[0]}")
+
+            case 'plan':
+                n = int(args[0]) if args and args[0].isdigit() else self.tactic_num
+                if (n, self.team) not in self.programs:
+                    await self._err(f"Taktik {n} nicht vorhanden oder ungültig")
+                    return
+                await self._send(f"─── Plan Taktik {n} ({self.team}) " + "─" * 20)
+                for l in plan_report(self.programs[(n, self.team)], Task.SETTLE, Task.SETTLE_DEFAULT):
+                    await self._send("  " + l)
+
             case 'tactics':
                 for n, name in TACTIC_NAMES.items():
                     await self._send(f"TACTIC {n} {name}")
@@ -191,6 +293,9 @@ class Robot:
                 if self.state not in (State.IDLE, State.DONE):
                     await self._err(f"Nur im IDLE/DONE möglich (aktuell: {self.state.value})")
                     return
+                if self.tactic_num in self.tactic_errors:
+                    await self._err(f"Taktik {self.tactic_num} ungültig: {self.tactic_errors[self.tactic_num]}")
+                    return
                 self._game_task = asyncio.create_task(self._flow_ready())
 
             case 'home' | 'h':
@@ -234,7 +339,7 @@ class Robot:
                 match sub:
                     case 'open'  | 'o': self.gripper.loslassen()
                     case 'close' | 'c': self.gripper.greifen()
-                    case 'home'  | 'h': self.gripper.home()
+                    case 'home'  | 'h': await self.gripper.home()
                     case _:
                         await self._err("Verwendung: gripper open|close|home")
                         return
@@ -252,6 +357,8 @@ class Robot:
             "  status / s              aktuellen Zustand anzeigen",
             "  team blue|yellow        Team setzen",
             "  tactic <n> / t <n>      Taktik wählen",
+            "  opt on|off              Fahrsegmente zusammenfassen",
+            "  plan [n]                Dry-Run: was opt spart",
             "  ready / r               Homing + Zugschnur + Taktik starten",
             "  home / h                nur Homing (kein Spielstart)",
             "  stop                    Notfall-Stopp",
@@ -296,7 +403,7 @@ class Robot:
 
     async def _do_homing(self):
         self.log("Servos werden aktiviert …")
-        self.servos.attach_all()
+        await asyncio.to_thread(self.servos.attach_all)
         homing = Task(self.esp32, self.camera, self.gripper,
                       [['hg', 'hm']], self.team, self.lidar)
         while True:
@@ -305,8 +412,10 @@ class Robot:
                 break
 
     async def _run_tactic(self):
-        actions = copy.deepcopy(TACTICS[self.tactic_num])
-        task    = Task(self.esp32, self.camera, self.gripper, actions, self.team, self.lidar)
+        program = self.programs[(self.tactic_num, self.team)]
+        if self.optimize:
+            program = optimize(program)
+        task    = Task(self.esp32, self.camera, self.gripper, program, self.team, self.lidar)
 
         timer = asyncio.create_task(self._game_timer())
         try:
@@ -317,7 +426,7 @@ class Robot:
         finally:
             timer.cancel()
             await self.esp32.set_stop()
-            self.servos.alle_auf()
+            self.servos.emergency('auf')
 
     async def _game_timer(self):
         """Zentrales Zeitlimit: stoppt nach 99s alles vom Raspi aus."""
@@ -325,14 +434,13 @@ class Robot:
         await asyncio.sleep(GAME_TIME)
         self.log(f"Spielzeit ({GAME_TIME}s) abgelaufen – stoppe.")
         await self.esp32.set_stop()
-        self.servos.alle_auf()
+        self.servos.emergency('auf')   # überholt noch wartende Servo-Befehle
         if self._game_task and not self._game_task.done():
             self._game_task.cancel()
         self.state = State.DONE
 
     async def _test_winker(self, n: int = 5):
-        from modules.STservo_sdk.sts import STS_TORQUE_ENABLE
-        self.servos.packet_handler.write1ByteTxRx(8, STS_TORQUE_ENABLE, 1)
+        self.servos.set_torque(8, True)
         for i in range(n):
             self.servos.winker2_runter()
             await asyncio.sleep(1.5)
@@ -385,14 +493,33 @@ class Robot:
             self.log(f"Client getrennt: {addr}")
 
     async def _log_stream_loop(self):
-        """Schickt neue Log-Einträge aus der Queue zum Client."""
+        """Schickt neue Log-Zeilen zum Client – gesammelt, ein write pro LOG_TICK.
+
+        Ohne Client bleiben die letzten _LogRing.SIZE Zeilen im Ring und kommen beim
+        Verbinden. Hängt der Client (Sendepuffer über LOG_BUFFER_MAX), werden Log-Zeilen
+        verworfen und gezählt – Antworten auf Befehle gehen trotzdem raus.
+        """
+        skipped = 0
         while True:
-            msg = await self._log_queue.get()
-            await self._send(f"LOG {msg}")
+            await asyncio.sleep(self.LOG_TICK)
+            writer = self._writer
+            if not writer or writer.is_closing():
+                continue
+            lines, dropped = self._log_ring.take()
+            dropped += skipped
+            if writer.transport.get_write_buffer_size() > self.LOG_BUFFER_MAX:
+                skipped = dropped + len(lines)
+                continue
+            skipped = 0
+            if dropped:
+                lines.insert(0, f"… {dropped} Log-Zeilen verworfen")
+            if lines:
+                writer.write(''.join(f"LOG {l}\n" for l in lines).encode())
 
     async def start(self):
         server = await asyncio.start_server(self.handle_client, HOST, PORT)
         self.log(f"Server bereit auf {HOST}:{PORT}")
+        await self.telemetry_server.start()
         asyncio.create_task(self._log_stream_loop())
         asyncio.create_task(self._camera_loop())
         asyncio.create_task(self._lidar_loop())
@@ -431,7 +558,10 @@ class Robot:
             await asyncio.sleep(5)
 
     def cleanup(self):
+        self.camera.stop()
+        self.servos.close()
         self.lidar.stop()
+        self.esp32.close()
         GPIO.cleanup()
 
 
@@ -441,12 +571,14 @@ def _parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser(description='Eurobot 2026 Hauptprogramm')
     p.add_argument('--team', choices=['blue', 'yellow'], default='blue',
                    help='Teamfarbe (default: blue)')
+    p.add_argument('--vision-process', action='store_true',
+                   help=f'Kamera-Pipeline in eigenem Prozess auf Kern {VisionWorker.CORE}')
     return p.parse_args()
 
 
 async def main():
     args  = _parse_args()
-    robot = Robot(team=args.team)
+    robot = Robot(team=args.team, vision_process=args.vision_process)
     loop  = asyncio.get_running_loop()
 
     loop.add_signal_handler(signal.SIGINT,  lambda: asyncio.create_task(_shutdown(robot, loop)))
@@ -458,6 +590,7 @@ async def main():
 async def _shutdown(robot: Robot, loop: asyncio.AbstractEventLoop):
     robot.log("Shutdown …")
     await robot.esp32.set_stop()
+    await robot.telemetry_server.stop()
     robot.cleanup()
     tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
     [t.cancel() for t in tasks]
@@ -44,6 +44,11 @@ class GroupSyncRead:
     def clearParam(self):
         self.data_dict.clear()
 
+    def clearData(self):
+        # drop the last reply so a missing/short one does not leave stale data behind
+        for sts_id in self.data_dict:
+            self.data_dict[sts_id] = []
+
     def txPacket(self):
         if len(self.data_dict.keys()) == 0:
 
@@ -83,44 +88,17 @@ class GroupSyncRead:
         return self.rxPacket()
 
     def readRx(self, rxpacket, sts_id, data_length):
-        # print(sts_id)
-        # print(rxpacket)
-        data = []
+        # rxpacket: view into the handler's syncbuf, search the status packet by index
+        buf = rxpacket.obj if isinstance(rxpacket, memoryview) else bytes(rxpacket)
         rx_length = len(rxpacket)
-        # print(rx_length)
-        rx_index = 0;
-        while (rx_index+6+data_length) <= rx_length:
-            headpacket = [0x00, 0x00, 0x00]
-            while rx_index < rx_length:
-                headpacket[2] = headpacket[1];
-                headpacket[1] = headpacket[0];
-                headpacket[0] = rxpacket[rx_index];
-                rx_index += 1
-                if (headpacket[2] == 0xFF) and (headpacket[1] == 0xFF) and headpacket[0] == sts_id:
-                    # print(rx_index)
-                    break
-            # print(rx_index+3+data_length)
-            if (rx_index+3+data_length) > rx_length:
-                break;
-            if rxpacket[rx_index] != (data_length+2):
-                rx_index += 1
-                # print(rx_index)
-                continue
-            rx_index += 1
-            Error = rxpacket[rx_index]
-            rx_index += 1
-            calSum = sts_id + (data_length+2) + Error
-            data = [Error]
-            data.extend(rxpacket[rx_index : rx_index+data_length])
-            for i in range(0, data_length):
-                calSum += rxpacket[rx_index]
-                rx_index += 1
-            calSum = ~calSum & 0xFF
-            # print(calSum)
-            if calSum != rxpacket[rx_index]:
-                return None, COMM_RX_CORRUPT
-            return data, COMM_SUCCESS 
-        # print(rx_index)
+        header = bytes((0xFF, 0xFF, sts_id, data_length + 2))
+        rx_index = buf.find(header, 0, rx_length)
+        while rx_index >= 0 and (rx_index + 6 + data_length) <= rx_length:
+            # ID LEN ERROR DATA... CHKSUM
+            calSum = ~sum(rxpacket[rx_index + 2 : rx_index + 5 + data_length]) & 0xFF
+            if calSum == rxpacket[rx_index + 5 + data_length]:
+                return bytes(rxpacket[rx_index + 4 : rx_index + 5 + data_length]), COMM_SUCCESS  # [Error, data...]
+            rx_index = buf.find(header, rx_index + 1, rx_length)
         return None, COMM_RX_CORRUPT
 
     def isAvailable(self, sts_id, address, data_length):
@@ -140,12 +118,12 @@ class GroupSyncRead:
         if data_length == 1:
             return self.data_dict[sts_id][address-self.start_address+1]
         elif data_length == 2:
-            return self.ph.scs_makeword(self.data_dict[sts_id][address-self.start_address+1],
+            return self.ph.sts_makeword(self.data_dict[sts_id][address-self.start_address+1],
                                 self.data_dict[sts_id][address-self.start_address+2])
         elif data_length == 4:
-            return self.ph.scs_makedword(self.ph.scs_makeword(self.data_dict[sts_id][address-self.start_address+1],
+            return self.ph.sts_makedword(self.ph.sts_makeword(self.data_dict[sts_id][address-self.start_address+1],
                                               self.data_dict[sts_id][address-self.start_address+2]),
-                                 self.ph.scs_makeword(self.data_dict[sts_id][address-self.start_address+3],
+                                 self.ph.sts_makeword(self.data_dict[sts_id][address-self.start_address+3],
                                               self.data_dict[sts_id][address-self.start_address+4]))
         else:
             return 0
@@ -5,8 +5,12 @@ import serial
 import sys
 import platform
 
+from .stservo_def import *
+
 DEFAULT_BAUDRATE = 1000000
-LATENCY_TIMER = 50 
+LATENCY_TIMER = 50     # ms, upper bound for the reply latency (and start value)
+LATENCY_MIN = 2.0      # ms, lower bound (USB adapter + servo return delay)
+DEFAULT_RETRIES = 1    # extra attempts for a status packet that times out / is corrupt
 
 class PortHandler(object):
     def __init__(self, port_name):
@@ -14,8 +18,17 @@ class PortHandler(object):
         self.baudrate = DEFAULT_BAUDRATE
         self.packet_start_time = 0.0
         self.packet_timeout = 0.0
+        self.packet_wire_time = 0.0
         self.tx_time_per_byte = 0.0
 
+        # adaptive reply latency (ms), smoothed like a TCP retransmit timer
+        self.latency = float(LATENCY_TIMER)
+        self.latency_avg = None
+        self.latency_var = 0.0
+
+        self.retries = DEFAULT_RETRIES
+        self.stats = {'packets': 0, 'timeouts': 0, 'corrupt': 0, 'retries': 0}
+
         self.is_using = False
         self.port_name = port_name
         self.ser = None
@@ -30,6 +43,10 @@ class PortHandler(object):
     def clearPort(self):
         self.ser.flush()
 
+    def clearPortInput(self):
+        # drop a late reply before retrying, so it is not taken for the new one
+        self.ser.reset_input_buffer()
+
     def setPortName(self, port_name):
         self.port_name = port_name
 
@@ -63,11 +80,14 @@ class PortHandler(object):
         return self.ser.write(packet)
 
     def setPacketTimeout(self, packet_length):
+        # deadline = wire time of the expected bytes + current latency estimate
         self.packet_start_time = self.getCurrentTime()
-        self.packet_timeout = (self.tx_time_per_byte * packet_length) + (self.tx_time_per_byte * 3.0) + LATENCY_TIMER
+        self.packet_wire_time = self.tx_time_per_byte * (packet_length + 3.0)
+        self.packet_timeout = self.packet_wire_time + self.latency
 
     def setPacketTimeoutMillis(self, msec):
         self.packet_start_time = self.getCurrentTime()
+        self.packet_wire_time = 0.0
         self.packet_timeout = msec
 
     def isPacketTimeout(self):
@@ -78,14 +98,35 @@ class PortHandler(object):
         return False
 
     def getCurrentTime(self):
-        return round(time.time() * 1000000000) / 1000000.0
+        # ms on the monotonic clock – NTP steps cannot stretch or cut a timeout
+        return time.monotonic() * 1000.0
 
     def getTimeSinceStart(self):
-        time_since = self.getCurrentTime() - self.packet_start_time
-        if time_since < 0.0:
-            self.packet_start_time = self.getCurrentTime()
+        return self.getCurrentTime() - self.packet_start_time
+
+    def packetDone(self, result, adapt=True):
+        # called by the packet handler once per status packet / sync read
+        self.stats['packets'] += 1
+        if result == COMM_SUCCESS:
+            self.updateLatency(max(0.0, self.getTimeSinceStart() - self.packet_wire_time))
+        elif result == COMM_RX_TIMEOUT:
+            self.stats['timeouts'] += 1
+            if adapt:
+                # estimate may be too tight: back off, successes pull it down again
+                self.latency = min(LATENCY_TIMER, self.latency * 1.5)
+        else:
+            self.stats['corrupt'] += 1
+
+    def updateLatency(self, sample):
+        if self.latency_avg is None:
+            self.latency_avg, self.latency_var = sample, sample / 2
+        else:
+            self.latency_var = 0.75 * self.latency_var + 0.25 * abs(self.latency_avg - sample)
+            self.latency_avg = 0.875 * self.latency_avg + 0.125 * sample
+        self.latency = min(LATENCY_TIMER, max(LATENCY_MIN, self.latency_avg + 4 * self.latency_var))
 
-        return time_since
+    def getStats(self):
+        return dict(self.stats, latency_ms=round(self.latency, 2))
 
     def setupPort(self, cflag_baud):
         if self.is_open:
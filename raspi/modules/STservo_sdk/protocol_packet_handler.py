@@ -28,6 +28,14 @@ class protocol_packet_handler(object):
         self.portHandler = portHandler
         self.sts_end = protocol_end
 
+        # preallocated packet buffers (no per-packet lists)
+        self.txbuf = bytearray(TXPACKET_MAX_LEN)
+        self.rxbuf = bytearray(2 * RXPACKET_MAX_LEN)
+        self.syncbuf = bytearray(RXPACKET_MAX_LEN)
+        self._txview = memoryview(self.txbuf)
+        self._rxview = memoryview(self.rxbuf)
+        self._syncview = memoryview(self.syncbuf)
+
     def sts_getend(self):
         return self.sts_end
 
@@ -116,8 +124,15 @@ class protocol_packet_handler(object):
 
         return ""
 
+    def makePacket(self, sts_id, length, instruction):
+        # build the next packet directly in txbuf; pass the result to txPacket()
+        txpacket = self.txbuf
+        txpacket[PKT_ID] = sts_id
+        txpacket[PKT_LENGTH] = length
+        txpacket[PKT_INSTRUCTION] = instruction
+        return txpacket
+
     def txPacket(self, txpacket):
-        checksum = 0
         total_packet_length = txpacket[PKT_LENGTH] + 4  # 4: HEADER0 HEADER1 ID LENGTH
 
         if self.portHandler.is_using:
@@ -129,21 +144,22 @@ class protocol_packet_handler(object):
             self.portHandler.is_using = False
             return COMM_TX_ERROR
 
-        # make packet header
-        txpacket[PKT_HEADER0] = 0xFF
-        txpacket[PKT_HEADER1] = 0xFF
-
-        # add a checksum to the packet
-        for idx in range(2, total_packet_length - 1):  # except header, checksum
-            checksum += txpacket[idx]
+        # packets not built with makePacket() (lists) are copied into txbuf
+        buf = self.txbuf
+        if txpacket is not buf:
+            buf[0:total_packet_length] = txpacket[0:total_packet_length]
 
-        txpacket[total_packet_length - 1] = ~checksum & 0xFF
+        # make packet header
+        buf[PKT_HEADER0] = 0xFF
+        buf[PKT_HEADER1] = 0xFF
 
-        #print "[TxPacket] %r" % txpacket
+        # add a checksum to the packet (except header, checksum)
+        packet = self._txview[0:total_packet_length]
+        buf[total_packet_length - 1] = ~sum(packet[2:total_packet_length - 1]) & 0xFF
 
         # tx packet
         self.portHandler.clearPort()
-        written_packet_length = self.portHandler.writePort(txpacket)
+        written_packet_length = self.portHandler.writePort(packet)
         if total_packet_length != written_packet_length:
             self.portHandler.is_using = False
             return COMM_TX_FAIL
@@ -151,34 +167,50 @@ class protocol_packet_handler(object):
         return COMM_SUCCESS
 
     def rxPacket(self):
-        rxpacket = []
+        # returns a view into rxbuf – valid until the next rxPacket()
+        buf = self.rxbuf
+        view = self._rxview
+        capacity = len(buf)
+        readPort = self.portHandler.readPort
 
         result = COMM_TX_FAIL
-        checksum = 0
+        start = 0  # packet start in rxbuf (resync moves the index, no del rxpacket[0])
         rx_length = 0
         wait_length = 6  # minimum length (HEADER0 HEADER1 ID LENGTH ERROR CHKSUM)
 
         while True:
-            rxpacket.extend(self.portHandler.readPort(wait_length - rx_length))
-            rx_length = len(rxpacket)
+            if start + wait_length > capacity:
+                # out of room behind the garbage: move the partial packet to the front
+                view[0:rx_length] = view[start:start + rx_length]
+                start = 0
+
+            chunk = readPort(wait_length - rx_length)
+            if chunk:
+                end = start + rx_length
+                rx_length += len(chunk)
+                view[end:start + rx_length] = chunk
             if rx_length >= wait_length:
                 # find packet header
-                for idx in range(0, (rx_length - 1)):
-                    if (rxpacket[idx] == 0xFF) and (rxpacket[idx + 1] == 0xFF):
-                        break
+                if buf[start] == 0xFF and buf[start + 1] == 0xFF:
+                    idx = 0
+                else:
+                    idx = buf.find(b'\xff\xff', start, start + rx_length)
+                    if idx < 0:
+                        idx = start + rx_length - 1  # keep the last byte, may be the next 0xFF
+                    idx -= start
 
                 if idx == 0:  # found at the beginning of the packet
-                    if (rxpacket[PKT_ID] > 0xFD) or (rxpacket[PKT_LENGTH] > RXPACKET_MAX_LEN) or (
-                            rxpacket[PKT_ERROR] > 0x7F):
+                    if (buf[start + PKT_ID] > 0xFD) or (buf[start + PKT_LENGTH] > RXPACKET_MAX_LEN) or (
+                            buf[start + PKT_ERROR] > 0x7F):
                         # unavailable ID or unavailable Length or unavailable Error
-                        # remove the first byte in the packet
-                        del rxpacket[0]
+                        # skip the first byte in the packet
+                        start += 1
                         rx_length -= 1
                         continue
 
                     # re-calculate the exact length of the rx packet
-                    if wait_length != (rxpacket[PKT_LENGTH] + PKT_LENGTH + 1):
-                        wait_length = rxpacket[PKT_LENGTH] + PKT_LENGTH + 1
+                    if wait_length != (buf[start + PKT_LENGTH] + PKT_LENGTH + 1):
+                        wait_length = buf[start + PKT_LENGTH] + PKT_LENGTH + 1
                         continue
 
                     if rx_length < wait_length:
@@ -192,21 +224,19 @@ class protocol_packet_handler(object):
                         else:
                             continue
 
-                    # calculate checksum
-                    for i in range(2, wait_length - 1):  # except header, checksum
-                        checksum += rxpacket[i]
-                    checksum = ~checksum & 0xFF
+                    # calculate checksum (except header, checksum)
+                    checksum = ~sum(view[start + 2:start + wait_length - 1]) & 0xFF
 
                     # verify checksum
-                    if rxpacket[wait_length - 1] == checksum:
+                    if buf[start + wait_length - 1] == checksum:
                         result = COMM_SUCCESS
                     else:
                         result = COMM_RX_CORRUPT
                     break
 
                 else:
-                    # remove unnecessary packets
-                    del rxpacket[0: idx]
+                    # skip unnecessary bytes
+                    start += idx
                     rx_length -= idx
 
             else:
@@ -219,9 +249,21 @@ class protocol_packet_handler(object):
                     break
 
         self.portHandler.is_using = False
-        return rxpacket, result
+        self.portHandler.packetDone(result)
+        return view[start:start + rx_length], result
 
     def txRxPacket(self, txpacket):
+        # resend up to portHandler.retries times if the status packet is missing or corrupt
+        for attempt in range(self.portHandler.retries + 1):
+            if attempt:
+                self.portHandler.stats['retries'] += 1
+                self.portHandler.clearPortInput()
+            rxpacket, result, error = self.txRxPacketOnce(txpacket)
+            if result not in (COMM_RX_TIMEOUT, COMM_RX_CORRUPT):
+                break
+        return rxpacket, result, error
+
+    def txRxPacketOnce(self, txpacket):
         rxpacket = None
         error = 0
 
@@ -327,15 +369,12 @@ class protocol_packet_handler(object):
         return data, result, error
 
     def readTxRx(self, sts_id, address, length):
-        txpacket = [0] * 8
         data = []
 
         if sts_id >= BROADCAST_ID:
             return data, COMM_NOT_AVAILABLE, 0
 
-        txpacket[PKT_ID] = sts_id
-        txpacket[PKT_LENGTH] = 4
-        txpacket[PKT_INSTRUCTION] = INST_READ
+        txpacket = self.makePacket(sts_id, 4, INST_READ)
         txpacket[PKT_PARAMETER0 + 0] = address
         txpacket[PKT_PARAMETER0 + 1] = length
 
@@ -389,11 +428,7 @@ class protocol_packet_handler(object):
         return data_read, result, error
 
     def writeTxOnly(self, sts_id, address, length, data):
-        txpacket = [0] * (length + 7)
-
-        txpacket[PKT_ID] = sts_id
-        txpacket[PKT_LENGTH] = length + 3
-        txpacket[PKT_INSTRUCTION] = INST_WRITE
+        txpacket = self.makePacket(sts_id, length + 3, INST_WRITE)
         txpacket[PKT_PARAMETER0] = address
 
         txpacket[PKT_PARAMETER0 + 1: PKT_PARAMETER0 + 1 + length] = data[0: length]
@@ -404,11 +439,7 @@ class protocol_packet_handler(object):
         return result
 
     def writeTxRx(self, sts_id, address, length, data):
-        txpacket = [0] * (length + 7)
-
-        txpacket[PKT_ID] = sts_id
-        txpacket[PKT_LENGTH] = length + 3
-        txpacket[PKT_INSTRUCTION] = INST_WRITE
+        txpacket = self.makePacket(sts_id, length + 3, INST_WRITE)
         txpacket[PKT_PARAMETER0] = address
 
         txpacket[PKT_PARAMETER0 + 1: PKT_PARAMETER0 + 1 + length] = data[0: length]
@@ -476,12 +507,8 @@ class protocol_packet_handler(object):
         return result, error
 
     def syncReadTx(self, start_address, data_length, param, param_length):
-        txpacket = [0] * (param_length + 8)
         # 8: HEADER0 HEADER1 ID LEN INST START_ADDR DATA_LEN CHKSUM
-
-        txpacket[PKT_ID] = BROADCAST_ID
-        txpacket[PKT_LENGTH] = param_length + 4  # 7: INST START_ADDR DATA_LEN CHKSUM
-        txpacket[PKT_INSTRUCTION] = INST_SYNC_READ
+        txpacket = self.makePacket(BROADCAST_ID, param_length + 4, INST_SYNC_READ)  # 4: INST START_ADDR DATA_LEN CHKSUM
         txpacket[PKT_PARAMETER0 + 0] = start_address
         txpacket[PKT_PARAMETER0 + 1] = data_length
 
@@ -492,13 +519,18 @@ class protocol_packet_handler(object):
         return result
 
     def syncReadRx(self, data_length, param_length):
+        # returns a view into syncbuf – valid until the next syncReadRx()
         wait_length = (6 + data_length) * param_length
+        if wait_length > len(self.syncbuf):
+            self.syncbuf = bytearray(wait_length)
+            self._syncview = memoryview(self.syncbuf)
+        view = self._syncview
         self.portHandler.setPacketTimeout(wait_length)
-        rxpacket = []
         rx_length = 0
         while True:
-            rxpacket.extend(self.portHandler.readPort(wait_length - rx_length))
-            rx_length = len(rxpacket)
+            chunk = self.portHandler.readPort(wait_length - rx_length)
+            view[rx_length:rx_length + len(chunk)] = chunk
+            rx_length += len(chunk)
             if rx_length >= wait_length:
                 result = COMM_SUCCESS
                 break
@@ -511,15 +543,13 @@ class protocol_packet_handler(object):
                         result = COMM_RX_CORRUPT
                     break
         self.portHandler.is_using = False
-        return result, rxpacket
+        # a missing servo always ends in a timeout here – no back-off for that
+        self.portHandler.packetDone(result, adapt=False)
+        return result, view[0:rx_length]
 
     def syncWriteTxOnly(self, start_address, data_length, param, param_length):
-        txpacket = [0] * (param_length + 8)
         # 8: HEADER0 HEADER1 ID LEN INST START_ADDR DATA_LEN ... CHKSUM
-
-        txpacket[PKT_ID] = BROADCAST_ID
-        txpacket[PKT_LENGTH] = param_length + 4  # 4: INST START_ADDR DATA_LEN ... CHKSUM
-        txpacket[PKT_INSTRUCTION] = INST_SYNC_WRITE
+        txpacket = self.makePacket(BROADCAST_ID, param_length + 4, INST_SYNC_WRITE)  # 4: INST START_ADDR DATA_LEN ... CHKSUM
         txpacket[PKT_PARAMETER0 + 0] = start_address
         txpacket[PKT_PARAMETER0 + 1] = data_length
 
@@ -1,5 +1,7 @@
 #!/usr/bin/env python
 
+import struct
+
 from .stservo_def import *
 from .protocol_packet_handler import *
 from .group_sync_read import *
@@ -57,14 +59,21 @@ STS_MOVING = 66
 STS_PRESENT_CURRENT_L = 69
 STS_PRESENT_CURRENT_H = 70
 
+# ACC, POSITION, TIME, SPEED (STS/SMS: little endian)
+_POS_EX = struct.Struct('<BHHH')
+
 class sts(protocol_packet_handler):
     def __init__(self, portHandler):
         protocol_packet_handler.__init__(self, portHandler, 0)
         self.groupSyncWrite = GroupSyncWrite(self, STS_ACC, 7)
 
     def WritePosEx(self, sts_id, position, speed, acc):
-        txpacket = [acc, self.sts_lobyte(position), self.sts_hibyte(position), 0, 0, self.sts_lobyte(speed), self.sts_hibyte(speed)]
-        return self.writeTxRx(sts_id, STS_ACC, len(txpacket), txpacket)
+        # ACC POS_L POS_H TIME_L TIME_H SPEED_L SPEED_H straight into the tx buffer
+        txpacket = self.makePacket(sts_id, 10, INST_WRITE)
+        txpacket[PKT_PARAMETER0] = STS_ACC
+        _POS_EX.pack_into(txpacket, PKT_PARAMETER0 + 1, acc, position & 0xFFFF, 0, speed & 0xFFFF)
+        _, result, error = self.txRxPacket(txpacket)
+        return result, error
 
     def ReadPos(self, sts_id):
         sts_present_position, sts_comm_result, sts_error = self.read2ByteTxRx(sts_id, STS_PRESENT_POSITION_L)
@@ -85,7 +94,7 @@ class sts(protocol_packet_handler):
         return moving, sts_comm_result, sts_error
 
     def SyncWritePosEx(self, sts_id, position, speed, acc):
-        txpacket = [acc, self.sts_lobyte(position), self.sts_hibyte(position), 0, 0, self.sts_lobyte(speed), self.sts_hibyte(speed)]
+        txpacket = _POS_EX.pack(acc, position & 0xFFFF, 0, speed & 0xFFFF)
         return self.groupSyncWrite.addParam(sts_id, txpacket)
 
     def RegWritePosEx(self, sts_id, position, speed, acc):
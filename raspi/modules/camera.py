@@ -1,3 +1,4 @@
+import asyncio
 import cv2
 import numpy as np
 from picamera2 import Picamera2
@@ -6,7 +7,10 @@ import threading
 import math
 import logging
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
+
+from modules.frame_store import FrameStore
+from modules.tracker import CrateTracker
 
 
 @dataclass
@@ -33,9 +37,56 @@ class TagDetection:
 class Camera:
     CRATE_IDS = {36, 47, 41}
 
-    def __init__(self, marker_size_mm: float = 40.0, camera_resolution: Tuple[int, int] = (1280, 720)):
+    # Entzerrung:
+    #   'points' – Marker im Rohbild suchen, nur die Ecken entzerren (Standard, billig)
+    #   'frame'  – ganzes Bild per remap entzerren (für Bildausgabe/Debugging)
+    UNDISTORT_MODES = ('points', 'frame')
+
+    # Marker-Suche:
+    #   'roi'    – nur um die Treffer des letzten Bilds suchen, sonst verkleinert (Standard)
+    #   'scaled' – jedes Bild verkleinert absuchen
+    #   'full'   – jedes Bild in voller Auflösung absuchen (alter Weg)
+    # Treffer aus 'roi'/'scaled' werden in voller Auflösung per cornerSubPix verfeinert.
+    DETECT_MODES = ('roi', 'scaled', 'full')
+    DETECT_SCALE     = 0.5   # Verkleinerung für die Suche im ganzen Bild
+    FULL_SCAN_PERIOD = 0.5   # s  spätestens nach dieser Zeit das ganze Bild absuchen (neue Kistchen)
+    ROI_MARGIN       = 0.75  # Rand um einen Treffer, relativ zur Markergröße in Pixeln
+    ROI_MIN_MARGIN   = 24    # px
+    SUBPIX_WIN       = 5     # px, halbe Fenstergröße für cornerSubPix
+    SUBPIX_CRITERIA  = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.01)
+
+    # Pose: solvePnP (IPPE_SQUARE) auf normierten Ecken; die Lösung aus dem letzten
+    # Bild entscheidet zwischen den zwei Kandidaten, wenn der Marker nah daneben liegt
+    POSE_MATCH = 0.03   # normierte Bildkoordinaten (~27 px bei f=900)
+
+    # Aufnahmeformat:
+    #   'yuv' – YUV420 vom Sensor, die Y-Ebene geht ohne Kopie in die Erkennung,
+    #           BGR wird nur bei get_latest_frame() erzeugt (Standard)
+    #   'rgb' – RGB888 wie früher
+    CAPTURE_FORMATS = {'yuv': 'YUV420', 'rgb': 'RGB888'}
+
+    # Takt der Erkennung: im Leerlauf langsam, vor co/cg/ic (burst) bzw. solange
+    # jemand auf ein frisches Bild wartet (fresh) so schnell wie möglich
+    IDLE_FPS      = 2.0
+    BURST_FPS     = 30.0
+    BURST_HOLD    = 2.0   # s  Standarddauer von burst()
+    FRESH_TIMEOUT = 1.0   # s
+
+    def __init__(self, marker_size_mm: float = 40.0, camera_resolution: Tuple[int, int] = (1280, 720),
+                 undistort: str = 'points', detect: str = 'roi', capture: str = 'yuv',
+                 share: str | None = None):
+        if capture not in self.CAPTURE_FORMATS:
+            raise ValueError(f"capture muss eins von {tuple(self.CAPTURE_FORMATS)} sein, nicht '{capture}'")
+        if undistort not in self.UNDISTORT_MODES:
+            raise ValueError(f"undistort muss eins von {self.UNDISTORT_MODES} sein, nicht '{undistort}'")
+        if detect not in self.DETECT_MODES:
+            raise ValueError(f"detect muss eins von {self.DETECT_MODES} sein, nicht '{detect}'")
         self.marker_size = marker_size_mm
         self.camera_resolution = camera_resolution
+        self.undistort = undistort
+        self.detect_mode = detect
+        self.capture = capture
+        self.share = share   # Name des Frame-Stores im Shared Memory (None = nur im Prozess)
         self.logger = logging.getLogger(__name__)
 
         self.aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_4X4_50)
@@ -46,12 +97,39 @@ class Camera:
         self.camera_matrix = None
         self.dist_coeffs = None
 
+        # remap-Tabellen, einmal pro Kalibrierung/Bildgröße (initUndistortRectifyMap)
+        self._undistort_maps: Tuple[np.ndarray, np.ndarray] | None = None
+        self._undistort_size: Tuple[int, int] | None = None
+        self._rectified_matrix: np.ndarray | None = None   # Kameramatrix des entzerrten Bilds
+        self._no_dist = np.zeros((5, 1), dtype=np.float32)
+
+        # Markermodell in der Eckreihenfolge von detectMarkers (IPPE_SQUARE), einmal pro Größe
+        half = marker_size_mm / 2.0
+        self._marker_points = np.array([[-half, half, 0], [half, half, 0],
+                                        [half, -half, 0], [-half, -half, 0]], dtype=np.float32)
+        self._identity = np.eye(3, dtype=np.float64)
+        self._last_poses: Tuple[np.ndarray, List[np.ndarray]] = (np.empty((0, 2)), [])   # Mitten, rvecs
+
+        # Suchfenster (x0, y0, x1, y1) aus dem letzten Bild, Zeitpunkt des letzten Voll-Scans
+        self._rois: List[Tuple[int, int, int, int]] = []
+        self._last_full_scan = 0.0
+
         self.tracked_crates: Dict[int, CratePosition] = {}
 
         self._latest_tags: List[TagDetection] = []
-        self._latest_frame: np.ndarray | None = None
+        self.tracker = CrateTracker()   # Spuren über die letzten Bilder für get_gripper_positions()
+        self.frames: FrameStore | None = None        # Sensorbilder im Aufnahmeformat, ab dem ersten Bild
+        self._latest_stamp = 0.0                      # monotonic() vor der Aufnahme
         self._lock = threading.Lock()
 
+        self._burst_until = 0.0
+        self._wake = threading.Event()
+        self._waiters: list[tuple[float, asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._generation = 0
+
+        # Wird nach jedem Bild mit (tags, Aufnahmezeit) aufgerufen (Capture-Thread) – VisionWorker
+        self.on_detect: Callable[[List[TagDetection], float], None] | None = None
+
         self.running = False
         self.thread = None
 
@@ -60,7 +138,7 @@ class Camera:
     def setup_camera(self):
         self.picam2 = Picamera2()
         config = self.picam2.create_preview_configuration(
-            main={"size": self.camera_resolution, "format": "RGB888"}
+            main={"size": self.camera_resolution, "format": self.CAPTURE_FORMATS[self.capture]}
         )
         self.picam2.configure(config)
         self.picam2.start()
@@ -81,54 +159,184 @@ class Camera:
                 [[fx, 0, cx], [0, fy, cy], [0, 0, 1]], dtype=np.float32
             )
             self.dist_coeffs = np.zeros((5, 1), dtype=np.float32)
+        self._undistort_maps = None
+        if self.undistort == 'frame':
+            self._init_undistort_maps(self.camera_resolution)
+
+    def _init_undistort_maps(self, size: Tuple[int, int]):
+        new_camera_matrix, _ = cv2.getOptimalNewCameraMatrix(
+            self.camera_matrix, self.dist_coeffs, size, 1, size
+        )
+        self._undistort_maps = cv2.initUndistortRectifyMap(
+            self.camera_matrix, self.dist_coeffs, None, new_camera_matrix, size, cv2.CV_16SC2
+        )
+        self._undistort_size = size
+        self._rectified_matrix = new_camera_matrix
 
     # --- pipeline (aus camera.py übernommen) ---
 
     def capture_frame(self) -> np.ndarray:
-        frame = self.picam2.capture_array()
-        return cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+        return self.to_bgr(self.picam2.capture_array())
+
+    def to_bgr(self, raw: np.ndarray) -> np.ndarray:
+        if self.capture == 'yuv':
+            return cv2.cvtColor(raw, cv2.COLOR_YUV2BGR_I420)
+        return cv2.cvtColor(raw, cv2.COLOR_RGB2BGR)
+
+    def to_gray(self, raw: np.ndarray) -> np.ndarray:
+        if self.capture == 'yuv':
+            w, h = self.camera_resolution
+            return raw[:h, :w]   # Y-Ebene = Graubild, nur eine View
+        return cv2.cvtColor(raw, cv2.COLOR_RGB2GRAY)
 
     def undistort_image(self, image: np.ndarray) -> np.ndarray:
         h, w = image.shape[:2]
-        new_camera_matrix, _ = cv2.getOptimalNewCameraMatrix(
-            self.camera_matrix, self.dist_coeffs, (w, h), 1, (w, h)
-        )
-        return cv2.undistort(image, self.camera_matrix, self.dist_coeffs, None, new_camera_matrix)
+        if self._undistort_maps is None or self._undistort_size != (w, h):
+            self._init_undistort_maps((w, h))
+        map1, map2 = self._undistort_maps
+        return cv2.remap(image, map1, map2, cv2.INTER_LINEAR)
+
+    def normalize_corners(self, corners: List) -> np.ndarray:
+        """Marker-Ecken → normierte Bildkoordinaten (K = Einheitsmatrix), ein Aufruf für alle Marker.
+
+        Rohbild ('points'): mit Verzeichnung entzerren; entzerrtes Bild ('frame'):
+        nur dessen Kameramatrix herausrechnen.
+        """
+        pts = np.concatenate(corners).reshape(-1, 1, 2).astype(np.float32)
+        if self.undistort == 'frame':
+            pts = cv2.undistortPoints(pts, self._rectified_matrix, self._no_dist)
+        else:
+            pts = cv2.undistortPoints(pts, self.camera_matrix, self.dist_coeffs)
+        return pts.reshape(-1, 4, 2)
 
     def detect_aruco_markers(self, image: np.ndarray) -> Tuple[List, List, List]:
         corners, ids, rejected = self.aruco_detector.detectMarkers(image)
         return corners, ids, rejected
 
+    def find_markers(self, gray: np.ndarray) -> Tuple[List, np.ndarray | None]:
+        """Marker im Graubild suchen (je nach detect_mode), Ecken in vollen Pixeln."""
+        if self.detect_mode == 'full':
+            corners, ids, _ = self.detect_aruco_markers(gray)
+            return list(corners), ids
+
+        corners, ids = [], None
+        now = time.monotonic()
+        if self.detect_mode == 'roi' and self._rois and now - self._last_full_scan < self.FULL_SCAN_PERIOD:
+            corners, ids = self._detect_in_rois(gray, self._rois)
+        if ids is None:
+            # kein Suchfenster, nichts mehr drin oder Voll-Scan fällig
+            corners, ids = self._detect_scaled(gray)
+            self._last_full_scan = now
+        if ids is not None:
+            corners = self._refine_corners(gray, corners)
+        self._rois = self._rois_around(corners, gray.shape)
+        return corners, ids
+
+    def _detect_scaled(self, gray: np.ndarray) -> Tuple[List, np.ndarray | None]:
+        s = self.DETECT_SCALE
+        small = cv2.resize(gray, None, fx=s, fy=s, interpolation=cv2.INTER_AREA)
+        corners, ids, _ = self.detect_aruco_markers(small)
+        return [c / s for c in corners], ids
+
+    def _detect_in_rois(self, gray: np.ndarray, rois: List[Tuple[int, int, int, int]]
+                        ) -> Tuple[List, np.ndarray | None]:
+        corners, ids = [], []
+        for x0, y0, x1, y1 in rois:
+            roi_corners, roi_ids, _ = self.detect_aruco_markers(gray[y0:y1, x0:x1])
+            if roi_ids is not None:
+                corners += [c + np.float32((x0, y0)) for c in roi_corners]
+                ids.append(roi_ids)
+        return corners, (np.concatenate(ids) if ids else None)
+
+    def _refine_corners(self, gray: np.ndarray, corners: List) -> List:
+        """Ecken (aus verkleinertem Bild/ROI) in voller Auflösung nachschärfen."""
+        pts = np.concatenate(corners).reshape(-1, 1, 2).astype(np.float32)
+        win = (self.SUBPIX_WIN, self.SUBPIX_WIN)
+        cv2.cornerSubPix(gray, pts, win, (-1, -1), self.SUBPIX_CRITERIA)
+        return list(pts.reshape(-1, 1, 4, 2))
+
+    def _rois_around(self, corners: List, shape: Tuple[int, ...]) -> List[Tuple[int, int, int, int]]:
+        """Suchfenster um jeden Treffer, überlappende zusammengefasst."""
+        h, w = shape[:2]
+        boxes = []
+        for c in corners:
+            (x0, y0), (x1, y1) = c.reshape(4, 2).min(axis=0), c.reshape(4, 2).max(axis=0)
+            m = max(self.ROI_MIN_MARGIN, self.ROI_MARGIN * max(x1 - x0, y1 - y0))
+            boxes.append([max(0, int(x0 - m)), max(0, int(y0 - m)), min(w, int(x1 + m) + 1), min(h, int(y1 + m) + 1)])
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(boxes)):
+                for j in range(i + 1, len(boxes)):
+                    a, b = boxes[i], boxes[j]
+                    if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                        boxes[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                        del boxes[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+        return [tuple(b) for b in boxes]
+
     def estimate_pose(self, corners: List, ids: List) -> List[CratePosition]:
         detected_crates = []
+        centers, rvecs = np.empty((0, 2)), []
         if ids is not None:
-            rvecs, tvecs, _ = cv2.aruco.estimatePoseSingleMarkers(
-                corners, self.marker_size, self.camera_matrix, self.dist_coeffs
-            )
+            now = time.time()
+            pts = self.normalize_corners(corners)
+            centers = pts.mean(axis=1)
+            guesses = self._previous_poses(centers)
             for i, marker_id in enumerate(ids.flatten()):
+                rvec, tvec = self._solve_marker(pts[i], guesses[i])
+                rvecs.append(rvec)
                 if marker_id in self.CRATE_IDS:
-                    distance = np.linalg.norm(tvecs[i])
                     detected_crates.append(CratePosition(
                         id=int(marker_id),
-                        tvec=tvecs[i],
-                        rvec=rvecs[i],
-                        distance=distance,
-                        timestamp=time.time(),
+                        tvec=tvec.reshape(1, 3),
+                        rvec=rvec.reshape(1, 3),
+                        distance=cv2.norm(tvec),
+                        timestamp=now,
                     ))
+        self._last_poses = (centers, rvecs)
         return detected_crates
 
+    def _previous_poses(self, centers: np.ndarray) -> List[np.ndarray | None]:
+        """rvec aus dem letzten Bild je Marker (nächste Mitte innerhalb POSE_MATCH), sonst None."""
+        prev_centers, prev_rvecs = self._last_poses
+        if not prev_rvecs:
+            return [None] * len(centers)
+        dist = np.linalg.norm(centers[:, None] - prev_centers[None], axis=2)
+        nearest = dist.argmin(axis=1)
+        return [prev_rvecs[j] if dist[i, j] < self.POSE_MATCH else None
+                for i, j in enumerate(nearest)]
+
+    def _solve_marker(self, pts: np.ndarray, guess: np.ndarray | None) -> Tuple[np.ndarray, np.ndarray]:
+        """Pose eines Markers aus normierten Ecken (IPPE_SQUARE, geschlossene Lösung)."""
+        _, rvecs, tvecs, _ = cv2.solvePnPGeneric(
+            self._marker_points, pts, self._identity, None, flags=cv2.SOLVEPNP_IPPE_SQUARE
+        )
+        best = 0
+        if guess is not None and len(rvecs) > 1:
+            # Flache Marker sind zweideutig (Kippen zur oder weg von der Kamera):
+            # bei einem bekannten Marker die Lösung nehmen, die zum letzten Bild passt
+            best = int(cv2.norm(rvecs[1], guess) < cv2.norm(rvecs[0], guess))
+        return rvecs[best], tvecs[best]
+
     def update_tracking(self, detected_crates: List[CratePosition]):
         for crate in detected_crates:
             self.tracked_crates[crate.id] = crate
 
-    def process_frame(self) -> List[CratePosition]:
-        frame = self.capture_frame()
-        undistorted = self.undistort_image(frame)
-        corners, ids, _ = self.detect_aruco_markers(undistorted)
+    def _detect(self, gray: np.ndarray) -> List[CratePosition]:
+        if self.undistort == 'frame':
+            gray = self.undistort_image(gray)
+        corners, ids = self.find_markers(gray)
         detected_crates = self.estimate_pose(corners, ids)
         self.update_tracking(detected_crates)
         return detected_crates
 
+    def process_frame(self) -> List[CratePosition]:
+        return self._detect(self.to_gray(self.picam2.capture_array()))
+
     def get_crate_info(self, crate_id: int) -> Optional[CratePosition]:
         return self.tracked_crates.get(crate_id)
 
@@ -142,15 +350,83 @@ class Camera:
         self.thread.start()
         self.logger.info("Camera thread started")
 
+    def burst(self, duration: float = BURST_HOLD):
+        """Für duration Sekunden mit BURST_FPS erkennen (thread-safe, verlängert nur)."""
+        self._burst_until = max(self._burst_until, time.monotonic() + duration)
+        self._wakeup()
+
+    async def fresh(self, timeout: float = FRESH_TIMEOUT) -> bool:
+        """Wartet auf eine Erkennung, deren Aufnahme nach diesem Aufruf begonnen hat.
+
+        Danach liefern getTag()/get_gripper_positions() dieses Bild. False bei Timeout
+        (z.B. Kamera nicht gestartet).
+        """
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        with self._lock:
+            self._waiters.append((time.monotonic(), loop, fut))
+        self._wakeup()
+        try:
+            return await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            return False   # wird beim nächsten Bild verworfen (Future ist dann done)
+
+    @property
+    def generation(self) -> int:
+        """Zahl der bisher erkannten Bilder (für collect())."""
+        return self._generation
+
+    async def collect(self, since: int, frames: int = CrateTracker.WINDOW,
+                      timeout: float = FRESH_TIMEOUT) -> bool:
+        """Wartet, bis seit generation == since mindestens frames Bilder erkannt wurden.
+
+        Danach steht das Tracker-Fenster voll auf Bildern ab since. False bei Timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while self.generation - since < frames:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not await self.fresh(remaining):
+                return False
+        return True
+
+    def _wakeup(self):
+        self._wake.set()
+
+    def _publish(self, tags: List[TagDetection], stamp: float):
+        """Erkennung eines Bilds übernehmen: Tags, Tracker, wartende fresh()-Aufrufe."""
+        with self._lock:
+            self._latest_tags = tags
+            self.tracker.update(tags, stamp)
+            self._latest_stamp = stamp
+            self._generation += 1
+            ready = [w for w in self._waiters if w[0] <= stamp]
+            self._waiters = [w for w in self._waiters if w[0] > stamp and not w[2].done()]
+        for _, loop, fut in ready:
+            loop.call_soon_threadsafe(self._resolve, fut)
+
+    @staticmethod
+    def _resolve(fut: asyncio.Future):
+        if not fut.done():
+            fut.set_result(True)
+
+    def _pace(self, cycle_start: float):
+        with self._lock:
+            waiting = bool(self._waiters)
+        fast = waiting or time.monotonic() < self._burst_until
+        period = 1.0 / (self.BURST_FPS if fast else self.IDLE_FPS)
+        remaining = cycle_start + period - time.monotonic()
+        if remaining > 0:
+            # burst()/fresh() wecken sofort auf
+            self._wake.wait(remaining)
+        self._wake.clear()
+
     def _capture_loop(self):
         self.logger.info("Camera capture loop running")
         while self.running:
+            cycle_start = time.monotonic()
             try:
-                frame = self.capture_frame()
-                undistorted = self.undistort_image(frame)
-                corners, ids, _ = self.detect_aruco_markers(undistorted)
-                detected_crates = self.estimate_pose(corners, ids)
-                self.update_tracking(detected_crates)
+                raw = self.picam2.capture_array()
+                detected_crates = self._detect(self.to_gray(raw))
 
                 tags: List[TagDetection] = []
                 for crate in detected_crates:
@@ -162,13 +438,18 @@ class Camera:
                         distance=crate.distance,
                     ))
 
-                with self._lock:
-                    self._latest_tags = tags
-                    self._latest_frame = frame
+                if self.frames is None:
+                    self.frames = FrameStore(raw.shape, self.capture, name=self.share)
+                self.frames.publish(raw, cycle_start)
+
+                self._publish(tags, cycle_start)
+                if self.on_detect:
+                    self.on_detect(tags, cycle_start)
 
             except Exception as e:
                 if self.running:
                     self.logger.error(f"Camera error: {e}")
+            self._pace(cycle_start)
 
     TAG_BLUE   = 36
     TAG_YELLOW = 47
@@ -179,28 +460,25 @@ class Camera:
             return list(self._latest_tags)
 
     def get_latest_frame(self) -> np.ndarray | None:
-        with self._lock:
-            return self._latest_frame.copy() if self._latest_frame is not None else None
+        """Letztes Bild als BGR – wird erst hier aus dem Frame-Store konvertiert (keine Kopie nötig)."""
+        frames = self.frames
+        return frames.latest_bgr() if frames is not None else None
 
     def get_gripper_positions(self, team: str) -> list[int]:
         """
-        Sortiert alle sichtbaren Kistchen von links nach rechts (horizontal_angle).
+        Sortiert die bestätigten Kistchen-Spuren (CrateTracker) von links nach rechts.
         Gibt die Indizes (0=ganz links … 3=ganz rechts) zurück, an denen das eigene
         Team liegt. Diese Indizes entsprechen den 4 Greifern:
           0 → linker Außengreifer
           1 → linker Innengreifer
           2 → rechter Innengreifer
           3 → rechter Außengreifer
+        Eine Spur zählt erst, wenn sie in der Hälfte der letzten CrateTracker.WINDOW
+        Bilder gesehen wurde – ein einzelnes verpasstes Bild ändert nichts.
         """
         target_id = self.TAG_YELLOW if team == 'yellow' else self.TAG_BLUE
         with self._lock:
-            tags = list(self._latest_tags)
-
-        if not tags:
-            return []
-
-        tags_sorted = sorted(tags, key=lambda t: t.horizontal_angle)
-        return [i for i, t in enumerate(tags_sorted) if t.id == target_id]
+            return self.tracker.gripper_positions(target_id)
 
     def stop(self):
         self.running = False
@@ -213,4 +491,7 @@ class Camera:
             except Exception as e:
                 self.logger.error(f"Error stopping camera: {e}")
             self.picam2 = None
+        if self.frames:
+            self.frames.close()
+            self.frames = None
         self.logger.info("Camera stopped")
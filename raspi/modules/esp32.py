@@ -3,22 +3,201 @@ Serial interface to ESP32 for differential drive (2 stepper motors).
 
 ESP32 Protocol (text, newline-terminated):
   Raspi → ESP32:
-    DD{mm}        drive distance in mm (+ forward, - backward)
-    TA{deg}       turn by relative angle in degrees
+    DD{mm}#{id}   drive distance in mm (+ forward, - backward)
+    TA{deg}#{id}  turn by relative angle in degrees
+    HE#{id}       drive backwards until the endstop triggers
     ST            stop current drive motion immediately
     RS            resume drive motion after stop
+    CL            abort: stop the running command, drop all queued ones
     SP{x};{y};{t} set odometry position
+    PS{ms}        pose streaming: report progress every ms milliseconds (0 = off)
 
   ESP32 → Raspi:
-    OK            command completed (DD / TA)
-    ERR           error
-    P{x};{y};{t}  position update (optional, ESP32 can send periodically)
+    OK#{id}           command completed (DD / TA / HE)
+    INTERRUPTED#{id}  command aborted (ST while paused, or CL); in both cases
+                      the queued commands are dropped and acked the same way
+    ERR               error
+    P{id};{r};{l}     steps right/left since the running command started
+                      (with PS while moving, and right before INTERRUPTED)
+
+Commands carry an id so that up to WINDOW motion commands can be queued in
+the firmware's cmdQueue at once; acknowledgements are matched by id. A bare
+OK/INTERRUPTED (firmware without ids) completes the oldest pending command.
+
+The P progress lines are turned into a live pose (start pose of the running
+command + progress) and recorded with their receive time in a PoseHistory, so
+that lidar points can be projected with the pose at their own capture time.
 """
 
+import os
 import serial
 import asyncio
 import math
 import logging
+import threading
+import numpy as np
+from collections import deque
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import Callable
+
+
+class SerialLink:
+    """Nicht-blockierende Zeilen-Verbindung zum ESP32 über den asyncio-Loop.
+
+    Lesen: loop.add_reader auf den Port-fd, eingehende Bytes werden inkrementell
+    in Zeilen zerlegt und mit Empfangszeit (monotonic) in eine asyncio.Queue
+    gelegt. Schreiben: direkt per
+    os.write auf den (O_NONBLOCK) fd, ein Rest wird per add_writer nachgeschoben.
+    Kein Aufruf blockiert den Loop.
+
+    EOF oder ein Lese-/Schreibfehler (USB-Serial abgezogen) gilt als Verbindungsverlust:
+    fd wird abgemeldet, lost gesetzt, einmal geloggt und on_lost(Fehler) aufgerufen.
+    """
+    MAX_LINE = 256
+
+    def __init__(self, ser: serial.Serial):
+        self.ser = ser
+        self.fd = ser.fileno()
+        self.logger = logging.getLogger(__name__)
+        self.lines: asyncio.Queue[tuple[float, str]] = asyncio.Queue()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._rx = bytearray()
+        self._rx_scan = 0      # bis hierhin ist _rx schon nach '\n' durchsucht
+        self._tx = bytearray()
+        self.lost: Exception | None = None
+        self.on_lost: Callable[[Exception], None] | None = None
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        if self._loop is loop or self.lost:
+            return
+        self._loop = loop
+        loop.add_reader(self.fd, self._on_readable)
+        if self._tx:
+            loop.add_writer(self.fd, self._on_writable)
+
+    def close(self):
+        if self._loop:
+            self._loop.remove_reader(self.fd)
+            self._loop.remove_writer(self.fd)
+            self._loop = None
+        self.ser.close()
+
+    def _on_readable(self):
+        try:
+            data = os.read(self.fd, 4096)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self._lose(e)
+            return
+        if not data:
+            self._lose(ConnectionError("EOF"))
+            return
+        stamp = monotonic()
+        self._rx += data
+
+        while True:
+            idx = self._rx.find(b'\n', self._rx_scan)
+            if idx < 0:
+                self._rx_scan = len(self._rx)
+                if self._rx_scan > self.MAX_LINE:
+                    self._rx.clear()
+                    self._rx_scan = 0
+                return
+            line = self._rx[:idx].decode(errors='replace').strip()
+            del self._rx[:idx + 1]
+            self._rx_scan = 0
+            if line:
+                self.lines.put_nowait((stamp, line))
+
+    def write(self, data: bytes):
+        if self.lost:
+            return
+        if not self._tx:
+            try:
+                n = os.write(self.fd, data)
+            except BlockingIOError:
+                n = 0
+            data = data[n:]
+            if not data:
+                return
+        self._tx += data
+        if self._loop:
+            self._loop.add_writer(self.fd, self._on_writable)
+
+    def _on_writable(self):
+        try:
+            n = os.write(self.fd, self._tx)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self._lose(e)
+            return
+        del self._tx[:n]
+        if not self._tx:
+            self._loop.remove_writer(self.fd)
+
+    def _lose(self, error: Exception):
+        # Ohne remove_reader ruft der Loop _on_readable sofort wieder auf (100 % CPU)
+        if self.lost:
+            return
+        self.lost = error
+        self.logger.error(f"Serial-Verbindung verloren: {error}")
+        if self._loop:
+            self._loop.remove_reader(self.fd)
+            self._loop.remove_writer(self.fd)
+        self._tx.clear()
+        if self.on_lost:
+            self.on_lost(error)
+
+
+@dataclass
+class PendingCmd:
+    """Gesendeter Fahrbefehl, der noch auf OK/INTERRUPTED wartet."""
+    id: int
+    cmd: str
+    direction: int                        # für den Lidar-Wächter, solange der Befehl läuft
+    lidar: object | None
+    on_ok: Callable[[], None] | None      # Odometrie-Update bei vollständiger Fahrt
+    future: asyncio.Future = field(repr=False)
+
+
+class PoseHistory:
+    """Zeitgestempelte Posen als Ringpuffer, interpolierbar nach Zeit.
+
+    Geschrieben vom asyncio-Loop (Pose-Stream, Quittungen, set_pos), gelesen vom
+    Lidar-Thread. theta wird stetig gespeichert (ohne Sprung bei 360°), damit die
+    Interpolation über 0° hinweg stimmt.
+    """
+    SIZE = 512   # bei 50 Hz Pose-Stream ≈ 10 s
+
+    def __init__(self, size: int = SIZE):
+        self.size = size
+        self._buf = np.zeros((4, size), dtype=np.float64)   # t, x, y, theta
+        self._n = 0
+        self._lock = threading.Lock()
+
+    def append(self, t: float, x: float, y: float, theta: float):
+        with self._lock:
+            if self._n:
+                prev = self._buf[3, (self._n - 1) % self.size]
+                theta = prev + (theta - prev + 180) % 360 - 180
+            self._buf[:, self._n % self.size] = (t, x, y, theta)
+            self._n += 1
+
+    def at(self, t: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray] | None:
+        """Pose zu den Zeitpunkten t (monotonic), linear interpoliert.
+
+        Außerhalb der Historie wird die erste bzw. letzte Pose verwendet.
+        None, solange noch keine Pose vorliegt.
+        """
+        with self._lock:
+            if self._n == 0:
+                return None
+            n = min(self._n, self.size)
+            ts, xs, ys, th = self._buf[:, np.arange(self._n - n, self._n) % self.size]
+        return np.interp(t, ts, xs), np.interp(t, ts, ys), np.interp(t, ts, th)
 
 
 class ESP32:
@@ -27,8 +206,29 @@ class ESP32:
     # CH340:  usb-1a86_USB2.0-Ser_-if00-port0
     PORT = '/dev/serial/by-id/usb-1a86_USB_Serial-if00-port0'
 
+    WINDOW = 3   # max. gleichzeitig gesendete Fahrbefehle (1 aktiv + 2 in cmdQueue)
+    POSE_INTERVAL_MS = 20   # Pose-Stream (PS), 0 = aus
+
+    # Muss zu ESP/src/main.cpp passen – rechnet P-Schritte in mm / Grad um
+    STEPS_PER_MM  = 730.0 / (48.0 * math.pi)
+    STEPS_PER_DEG = 226.0 * math.pi / 360.0 * STEPS_PER_MM
+    LEFT_RATIO    = 1465.0 / 1500.0   # MAX_SPEED_L / MAX_SPEED_R
+    MAX_SPEED     = 1500.0            # steps/s (MAX_SPEED_R)
+    ACCEL         = 1200.0            # steps/s²
+
+    @classmethod
+    def motion_time(cls, steps: float) -> float:
+        """Dauer einer Fahrt über steps Schritte (Trapezprofil wie AccelStepper), in s."""
+        steps = abs(steps)
+        ramp = cls.MAX_SPEED ** 2 / cls.ACCEL   # Schritte für Beschleunigen + Bremsen
+        if steps >= ramp:
+            return steps / cls.MAX_SPEED + cls.MAX_SPEED / cls.ACCEL
+        return 2 * math.sqrt(steps / cls.ACCEL)
+
     def __init__(self, port: str = PORT, baudrate: int = 115200):
-        self.ser = serial.Serial(port, baudrate, timeout=0.05)
+        self.ser = serial.Serial(port, baudrate, timeout=0)
+        self.link = SerialLink(self.ser)
+        self.link.on_lost = self._on_link_lost
         self.logger = logging.getLogger(__name__)
 
         # Dead-reckoning position (updated after each command)
@@ -36,73 +236,196 @@ class ESP32:
         self.y: float = 0.0
         self.theta: float = 0.0
 
+        # Live-Pose während der Fahrt (aus P-Meldungen) + Historie für den Lidar
+        self.poses = PoseHistory()
+        self._live: tuple[float, float, float] | None = None
+        self._live_id = 0
+
+        # Pipelining: gesendete, noch nicht quittierte Befehle in Sende-Reihenfolge
+        self._next_id = 0
+        self._pending: deque[PendingCmd] = deque()
+        self._window = asyncio.Semaphore(self.WINDOW)
+        self._reader: asyncio.Task | None = None
+        self._watch = None
+        self._watch_lidar = None
+
     def set_pos(self, x: float, y: float, theta: float):
         self.x, self.y, self.theta = x, y, theta
+        self.poses.append(monotonic(), x, y, theta)
         self._write(f"SP{x:.0f};{y:.0f};{theta:.1f}")
 
     def _write(self, cmd: str):
         try:
-            self.ser.write(f"{cmd}\n".encode())
+            self.link.write(f"{cmd}\n".encode())
         except Exception as e:
             self.logger.error(f"Serial write error: {e}")
 
-    def _read_line(self) -> str | None:
-        if self.ser.in_waiting:
-            try:
-                return self.ser.readline().decode().strip()
-            except Exception:
-                pass
-        return None
+    def close(self):
+        if self._reader:
+            self._reader.cancel()
+        self.link.close()
 
-    def _parse_position(self, line: str):
+    def _parse_position(self, line: str, stamp: float):
+        """P{id};{r};{l}: Schritte seit Start des laufenden Befehls → Live-Pose."""
         try:
-            parts = line[1:].split(';')
-            self.x, self.y, self.theta = float(parts[0]), float(parts[1]), float(parts[2])
-        except Exception:
-            pass
-
-    async def _wait_for_ok(self, direction: int = 0, lidar=None) -> bool:
-        """Wartet auf OK/INTERRUPTED vom ESP32. Gibt True zurück wenn OK, False wenn unterbrochen."""
-        lidar_stopped = False
+            tag, r, l = line[1:].split(';')
+            cmd_id, r, l = int(tag), int(r), int(l) / self.LEFT_RATIO
+        except ValueError:
+            return
+        head = self._pending[0] if self._pending else None
+        if head is None or (cmd_id and head.id != cmd_id):
+            return   # verspätete Meldung eines schon quittierten Befehls
+
+        # Startpose des laufenden Befehls = Odometrie nach allen Vorgängern
+        if head.cmd.startswith('TA'):
+            deg = (l - r) / 2 / self.STEPS_PER_DEG
+            self._live = (self.x, self.y, (self.theta + deg) % 360)
+        else:
+            mm = (r + l) / 2 / self.STEPS_PER_MM
+            rad = math.radians(self.theta)
+            self._live = (self.x + mm * math.sin(rad), self.y + mm * math.cos(rad), self.theta)
+        self._live_id = head.id
+        self.poses.append(stamp, *self._live)
+
+    def _pose(self) -> tuple[float, float, float]:
+        return self._live or (self.x, self.y, self.theta)
+
+    def _pose_at(self, t: np.ndarray):
+        """Pose zu Lidar-Zeitstempeln – Fallback auf die aktuelle Pose ohne Historie."""
+        return self.poses.at(t) or self._pose()
+
+    def _on_obstacle(self, stopped: bool):
+        """Vom Lidar-Wächter bei Zustandswechsel aufgerufen (im asyncio-Loop)."""
+        if stopped:
+            x, y, _ = self._pose()
+            self.logger.info(f"Obstacle – stop ({x:.0f},{y:.0f})")
+            self._write("ST")
+        else:
+            self.logger.info("Obstacle weg – resume")
+            self._write("RS")
+
+    # ── Pipelining ────────────────────────────────────────────────────────
+
+    def _ensure_reader(self):
+        if self.link.lost:
+            return
+        if self._reader is None or self._reader.done():
+            self.link.attach(asyncio.get_running_loop())
+            self._reader = asyncio.create_task(self._read_loop())
+            self._write(f"PS{self.POSE_INTERVAL_MS}")
+
+    async def _read_loop(self):
+        """Liest alle Zeilen vom ESP32 und ordnet Quittungen per id zu."""
         while True:
-            line = self._read_line()
-            if line == 'OK':
-                return True
-            if line == 'INTERRUPTED':
-                return False
-            elif line and line.startswith('P'):
-                self._parse_position(line)
-            elif line:
+            stamp, line = await self.link.lines.get()
+            msg, _, tag = line.partition('#')
+            if msg in ('OK', 'INTERRUPTED'):
+                self._complete(int(tag) if tag.isdigit() else None, msg == 'OK', stamp)
+            elif line.startswith('P'):
+                self._parse_position(line, stamp)
+            else:
                 self.logger.info(f"ESP32: {line}")
 
-            if lidar:
-                obstacle = lidar.get_stop(self.x, self.y, self.theta, direction)
-                if obstacle and not lidar_stopped:
-                    self.logger.info(f"Obstacle – stop ({self.x:.0f},{self.y:.0f})")
-                    self._write("ST")
-                    lidar_stopped = True
-                elif not obstacle and lidar_stopped:
-                    self.logger.info("Obstacle weg – resume")
-                    self._write("RS")
-                    lidar_stopped = False
-
-            await asyncio.sleep(0.01)
-
-    async def drive_distance(self, mm: int, lidar=None):
-        direction = 1 if mm >= 0 else -1
-        self._write(f"DD{mm}")
-        ok = await self._wait_for_ok(direction, lidar)
-        if ok:
+    def _complete(self, cmd_id: int | None, ok: bool, stamp: float):
+        if not self._pending:
+            self.logger.warning(f"ESP32: Quittung ohne offenen Befehl (id={cmd_id})")
+            return
+        if cmd_id is None:
+            p = self._pending[0]
+        else:
+            p = next((p for p in self._pending if p.id == cmd_id), None)
+            if p is None:
+                self.logger.warning(f"ESP32: Quittung für unbekannte id {cmd_id}")
+                return
+        was_running = p is self._pending[0]
+        self._pending.remove(p)
+        self._window.release()
+        if ok and p.on_ok:
+            # Quittungen kommen in Reihenfolge → Odometrie baut auf dem Vorgänger auf
+            p.on_ok()
+        elif not ok and self._live_id == p.id:
+            # Abgebrochen: letzte gemeldete Position übernehmen statt alter Startpose
+            self.x, self.y, self.theta = self._live
+        if was_running:
+            self._live = None
+            self._live_id = 0
+            self.poses.append(stamp, self.x, self.y, self.theta)
+        if not p.future.done():
+            p.future.set_result(ok)
+        self._update_watch()
+
+    def _on_link_lost(self, error: Exception):
+        """Serial weg: alle offenen Befehle mit Fehler beenden, Lidar-Wächter abmelden."""
+        if self._reader:
+            self._reader.cancel()
+        while self._pending:
+            p = self._pending.popleft()
+            self._window.release()
+            if not p.future.done():
+                p.future.set_exception(ConnectionError(f"ESP32-Verbindung verloren ({error})"))
+        self._live = None
+        self._live_id = 0
+        self._update_watch()
+
+    def _update_watch(self):
+        """Lidar-Wächter folgt immer dem gerade laufenden (ältesten offenen) Befehl."""
+        head = self._pending[0] if self._pending else None
+        lidar = head.lidar if head else None
+        if self._watch and (lidar is None or self._watch_lidar is not lidar):
+            self._watch_lidar.unwatch(self._watch)
+            self._watch = None
+        if lidar is None:
+            return
+        if self._watch is None:
+            self._watch = lidar.watch(head.direction, self._pose, self._on_obstacle,
+                                      pose_at=self._pose_at)
+            self._watch_lidar = lidar
+        else:
+            self._watch_lidar.set_direction(self._watch, head.direction)
+
+    async def submit(self, cmd: str, direction: int = 0, lidar=None,
+                     on_ok: Callable[[], None] | None = None) -> asyncio.Future:
+        """Befehl mit id senden, sobald im Fenster Platz ist.
+
+        Wartet nur auf einen freien Platz (max. WINDOW offene Befehle), nicht auf
+        die Ausführung. Das zurückgegebene Future liefert True bei OK, False bei
+        INTERRUPTED.
+        """
+        self._ensure_reader()
+        await self._window.acquire()
+        if self.link.lost:
+            self._window.release()
+            raise ConnectionError(f"ESP32 nicht verbunden ({self.link.lost})")
+        self._next_id = self._next_id % 9999 + 1
+        p = PendingCmd(self._next_id, cmd, direction, lidar, on_ok,
+                       asyncio.get_running_loop().create_future())
+        self._pending.append(p)
+        self._write(f"{cmd}#{p.id}")
+        self._update_watch()
+        return p.future
+
+    async def queue_drive(self, mm: int, lidar=None) -> asyncio.Future:
+        """DD senden ohne auf das OK zu warten (Pipelining)."""
+        def on_ok():
             # Position nur bei vollständiger Fahrt aktualisieren
             rad = math.radians(self.theta)
             self.x += mm * math.sin(rad)
             self.y += mm * math.cos(rad)
+        return await self.submit(f"DD{mm}", 1 if mm >= 0 else -1, lidar, on_ok)
 
-    async def turn_angle(self, deg: float, lidar=None):
-        self._write(f"TA{int(deg)}")
-        ok = await self._wait_for_ok(0, lidar)
-        if ok:
+    async def queue_turn(self, deg: float, lidar=None) -> asyncio.Future:
+        """TA senden ohne auf das OK zu warten (Pipelining)."""
+        def on_ok():
             self.theta = (self.theta + deg) % 360
+        return await self.submit(f"TA{int(deg)}", 0, lidar, on_ok)
+
+    # ── Fahrbefehle ───────────────────────────────────────────────────────
+
+    async def drive_distance(self, mm: int, lidar=None) -> bool:
+        return await (await self.queue_drive(mm, lidar))
+
+    async def turn_angle(self, deg: float, lidar=None) -> bool:
+        return await (await self.queue_turn(deg, lidar))
 
     async def turn_to(self, target: float, lidar=None):
         delta = target - self.theta
@@ -130,8 +453,11 @@ class ESP32:
 
     async def home_endstop(self):
         """Rückwärts fahren bis Endstop (GPIO5 am ESP32 LOW), dann OK abwarten."""
-        self._write("HE")
-        await self._wait_for_ok(0)
+        await (await self.submit("HE"))
 
     async def set_stop(self):
-        self._write("ST")
+        """Notfall-Stopp (Aktion es): laufende Fahrt abbrechen, wartende Befehle verwerfen.
+
+        Sendet CL, nicht ST – ST pausiert nur (Lidar) und bricht erst beim zweiten Mal ab.
+        """
+        self._write("CL")
@@ -0,0 +1,215 @@
+"""
+Frame-Store: das letzte Kamerabild für mehrere Leser, ohne Kopien.
+
+Ein Schreiber (Camera) legt jedes Bild reihum in einen von SLOTS Puffern und
+zählt eine Generation hoch. Leser bekommen mit latest() eine numpy-View auf den
+zuletzt fertigen Puffer – kein copy(), kein Lock. Ein Puffer wird frühestens
+SLOTS-1 Bilder später wieder beschrieben; wer länger braucht, prüft danach mit
+still_valid() (Sequenzzähler pro Slot) oder nimmt copy_latest().
+
+Mit name liegt alles in multiprocessing.shared_memory: main.py schreibt,
+camera_stream.py und camera_jakob.py hängen sich mit FrameStore.attach() an,
+statt die CSI-Kamera selbst zu öffnen. Ohne name bleibt der Store im Prozess
+und speichert nur Referenzen (die Kamera liefert ohnehin pro Bild ein neues Array).
+"""
+
+import time
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+
+import cv2
+import numpy as np
+
+_TO_BGR = {
+    'yuv':  cv2.COLOR_YUV2BGR_I420,
+    'rgb':  cv2.COLOR_RGB2BGR,
+    'gray': cv2.COLOR_GRAY2BGR,
+}
+
+
+@dataclass(frozen=True, slots=True)
+class Frame:
+    generation: int
+    stamp: float         # monotonic() der Aufnahme (Schreiber)
+    fmt: str             # 'yuv' | 'rgb' | 'bgr' | 'gray'
+    data: np.ndarray     # View in den Store – nicht verändern
+    slot: int
+
+    def bgr(self) -> np.ndarray:
+        """Als BGR-Bild – erzeugt ein neues Array (bzw. die View bei 'bgr')."""
+        if self.fmt == 'bgr':
+            return self.data
+        return cv2.cvtColor(self.data, _TO_BGR[self.fmt])
+
+
+class FrameStore:
+    SLOTS        = 3
+    DEFAULT_NAME = 'eurobot_camera'
+    FORMATS      = ('yuv', 'rgb', 'bgr', 'gray')
+    POLL_S       = 0.005   # wait_newer() – zwischen Prozessen gibt es kein Event
+
+    # Header (int64): Kennung, Format, Slots, Generation, Dimensionen, Sequenz pro Slot
+    _MAGIC = 0x4542_4652   # 'EBFR'
+    _H_MAGIC, _H_FMT, _H_SLOTS, _H_GEN, _H_NDIM = range(5)
+    _H_SHAPE = 5           # 3 Einträge
+    _H_SEQ   = 8           # SLOTS Einträge
+    _HEADER  = 16
+    _ALIGN   = 64
+
+    def __init__(self, shape: tuple[int, ...], fmt: str, name: str | None = None, slots: int = SLOTS):
+        """Store anlegen (Schreiber). Mit name im Shared Memory, ein alter Block gleichen Namens wird ersetzt."""
+        if fmt not in self.FORMATS:
+            raise ValueError(f"fmt muss eins von {self.FORMATS} sein, nicht '{fmt}'")
+        if len(shape) > 3 or slots > self._HEADER - self._H_SEQ:
+            raise ValueError(f"nicht unterstützt: shape {shape}, {slots} Slots")
+        self.name = name
+        self.owner = True
+        self._shm: shared_memory.SharedMemory | None = None
+        self._refs: list[np.ndarray | None] = [None] * slots
+
+        size = self._size(shape, slots)
+        if name is None:
+            buf = memoryview(bytearray(self._data_offset(slots)))
+        else:
+            try:
+                shared_memory.SharedMemory(name=name).unlink()   # Rest eines abgestürzten Laufs
+            except FileNotFoundError:
+                pass
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            buf = self._shm.buf
+        header = np.ndarray((self._HEADER,), dtype=np.int64, buffer=buf)
+        header[:] = 0
+        header[self._H_FMT] = self.FORMATS.index(fmt)
+        header[self._H_SLOTS] = slots
+        header[self._H_NDIM] = len(shape)
+        header[self._H_SHAPE:self._H_SHAPE + len(shape)] = shape
+        header[self._H_MAGIC] = self._MAGIC
+        self._map(buf)
+
+    @classmethod
+    def attach(cls, name: str = DEFAULT_NAME, untrack: bool = True) -> 'FrameStore':
+        """An einen Store im Shared Memory anhängen (Leser, aus einem anderen Prozess).
+
+        untrack=False, wenn der Schreiber ein Kindprozess ist (gemeinsamer
+        resource_tracker, siehe VisionWorker). FileNotFoundError, wenn keiner läuft.
+        """
+        shm = shared_memory.SharedMemory(name=name)
+        if untrack:
+            # Sonst räumt der resource_tracker des Lesers den Block beim Beenden weg (vor Python 3.13)
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        header = np.ndarray((cls._HEADER,), dtype=np.int64, buffer=shm.buf)
+        if header[cls._H_MAGIC] != cls._MAGIC:
+            del header
+            shm.close()
+            raise FileNotFoundError(f"'{name}' ist kein Frame-Store")
+        del header
+        self = cls.__new__(cls)
+        self.name = name
+        self.owner = False
+        self._shm = shm
+        self._refs = []
+        self._map(shm.buf)
+        return self
+
+    def _map(self, buf):
+        header = np.ndarray((self._HEADER,), dtype=np.int64, buffer=buf)
+        self.slots = int(header[self._H_SLOTS])
+        self.fmt = self.FORMATS[header[self._H_FMT]]
+        ndim = int(header[self._H_NDIM])
+        self.shape = tuple(int(n) for n in header[self._H_SHAPE:self._H_SHAPE + ndim])
+        self._header = header
+        self._seq = header[self._H_SEQ:self._H_SEQ + self.slots]
+        self._stamps = np.ndarray((self.slots,), dtype=np.float64, buffer=buf, offset=self._HEADER * 8)
+        if self._shm is None:
+            self._data = None   # im Prozess: Referenzen statt Puffer
+        else:
+            self._data = np.ndarray((self.slots, *self.shape), dtype=np.uint8, buffer=buf,
+                                    offset=self._data_offset(self.slots))
+
+    @classmethod
+    def _data_offset(cls, slots: int) -> int:
+        raw = cls._HEADER * 8 + slots * 8
+        return -(-raw // cls._ALIGN) * cls._ALIGN
+
+    @classmethod
+    def _size(cls, shape: tuple[int, ...], slots: int) -> int:
+        return cls._data_offset(slots) + slots * int(np.prod(shape))
+
+    # ── Schreiber ─────────────────────────────────────────────────────────
+
+    def publish(self, frame: np.ndarray, stamp: float | None = None) -> int:
+        """Bild ablegen, liefert die neue Generation."""
+        gen = int(self._header[self._H_GEN]) + 1
+        slot = gen % self.slots
+        self._seq[slot] = 2 * gen - 1            # ungerade: wird gerade beschrieben
+        if self._data is None:
+            self._refs[slot] = frame
+        else:
+            np.copyto(self._data[slot], frame)
+        self._stamps[slot] = time.monotonic() if stamp is None else stamp
+        self._seq[slot] = 2 * gen
+        self._header[self._H_GEN] = gen
+        return gen
+
+    # ── Leser ─────────────────────────────────────────────────────────────
+
+    @property
+    def generation(self) -> int:
+        return int(self._header[self._H_GEN])
+
+    def latest(self) -> Frame | None:
+        """View auf das neueste Bild (keine Kopie), None solange noch keins da ist."""
+        gen = self.generation
+        if gen == 0:
+            return None
+        slot = gen % self.slots
+        data = self._refs[slot] if self._data is None else self._data[slot]
+        return Frame(gen, float(self._stamps[slot]), self.fmt, data, slot)
+
+    def still_valid(self, frame: Frame) -> bool:
+        """True, solange der Slot von frame nicht überschrieben wurde."""
+        return int(self._seq[frame.slot]) == 2 * frame.generation
+
+    def copy_latest(self) -> Frame | None:
+        """Wie latest(), aber als eigene Kopie (für längere Verarbeitung)."""
+        while True:
+            frame = self.latest()
+            if frame is None:
+                return None
+            data = frame.data.copy()
+            if self.still_valid(frame):
+                return Frame(frame.generation, frame.stamp, frame.fmt, data, frame.slot)
+
+    def latest_bgr(self) -> np.ndarray | None:
+        """Neuestes Bild als BGR. Die Konvertierung ist die einzige Kopie."""
+        while True:
+            frame = self.latest()
+            if frame is None:
+                return None
+            bgr = frame.bgr()
+            if frame.fmt == 'bgr':
+                bgr = bgr.copy()
+            if self.still_valid(frame):
+                return bgr
+
+    def wait_newer(self, generation: int, timeout: float = 1.0) -> Frame | None:
+        """Wartet (blockierend) auf ein Bild mit höherer Generation, None bei Timeout."""
+        deadline = time.monotonic() + timeout
+        while self.generation <= generation:
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.POLL_S)
+        return self.latest()
+
+    def close(self):
+        """Views freigeben; der Schreiber entfernt den Shared-Memory-Block."""
+        self._header = self._seq = self._stamps = self._data = None
+        self._refs = []
+        if self._shm is not None:
+            self._shm.close()
+            if self.owner:
+                try:
+                    self._shm.unlink()
+                except FileNotFoundError:
+                    pass
+            self._shm = None
@@ -1,14 +1,19 @@
 from modules.servos import Servos
-from time import sleep
 
 
 class Gripper:
+    HOME_SETTLE = 1.0   # s  max. Wartezeit bis alle Servos die Home-Position erreicht haben
+
     def __init__(self, servos: Servos):
         self.servos = servos
 
-    def home(self):
+    async def home(self):
         self.servos.home()
-        sleep(1)
+        await self.settle(self.HOME_SETTLE)
+
+    async def settle(self, timeout: float) -> bool:
+        """Warten bis die zuletzt bewegten Servos stehen (Telemetrie), höchstens timeout."""
+        return await self.servos.wait_reached(timeout)
 
     # ── Greifer ───────────────────────────────────────────────────────────
 
@@ -30,8 +35,8 @@ class Gripper:
     # ── Lift ──────────────────────────────────────────────────────────────
 
     def lift_hoch(self):
-        self.servos.alle_auf()
-        self.servos.lift_hoch()
+        # Greifer auf + Lift hoch in einem Paket
+        self.servos.write_pose({**Servos.POSES['auf'], **Servos.POSES['lift_hoch']})
 
     def lift_runter(self):
         self.servos.lift_runter()
@@ -1,10 +1,157 @@
+import asyncio
 import threading
 import logging
-import queue
-import math
-from time import time_ns, sleep, time
+import numpy as np
+from dataclasses import dataclass
+from time import sleep, monotonic
+from typing import Callable
 from pyrplidar import PyRPlidar
 
+
+@dataclass(frozen=True, slots=True)
+class Scan:
+    """Eine vollständige Umdrehung als Views in den ScanRing (keine Kopie).
+
+    Gültig bis der Producer den Slot wieder überschreibt (ScanRing.SLOTS - 1
+    Umdrehungen später). Wer länger festhalten will: Felder mit .copy() sichern.
+    """
+    seq: int
+    stamp: float          # monotonic() des letzten Messpunkts der Umdrehung
+    angle: np.ndarray     # float32, Grad
+    distance: np.ndarray  # float32, mm
+    quality: np.ndarray   # uint8
+    t: np.ndarray         # float64, monotonic() pro Messpunkt
+
+    def __len__(self):
+        return len(self.angle)
+
+
+class ScanRing:
+    """Fester Ringpuffer für Lidar-Umdrehungen.
+
+    Ein Slot pro Umdrehung, je Feld ein zusammenhängendes Array. Der Scan-Thread
+    schreibt in-place in den aktuellen Slot und veröffentlicht ihn mit commit();
+    Leser bekommen über latest() die neueste vollständige Umdrehung als Views,
+    ohne sie zu verbrauchen; wait_newer() blockiert bis eine neuere vorliegt.
+    """
+    SLOTS      = 8
+    MAX_POINTS = 2048   # Punkte pro Umdrehung (A1 liefert ~400–800)
+
+    def __init__(self, slots: int = SLOTS, max_points: int = MAX_POINTS):
+        self.slots      = slots
+        self.max_points = max_points
+        self.angle    = np.zeros((slots, max_points), dtype=np.float32)
+        self.distance = np.zeros((slots, max_points), dtype=np.float32)
+        self.quality  = np.zeros((slots, max_points), dtype=np.uint8)
+        self.t        = np.zeros((slots, max_points), dtype=np.float64)
+        self.count    = np.zeros(slots, dtype=np.int32)
+        self.seq_of   = np.zeros(slots, dtype=np.int64)
+        self.stamp_of = np.zeros(slots, dtype=np.float64)
+
+        self.seq = 0              # Sequenznummer der neuesten Umdrehung (0 = noch keine)
+        self._latest = -1         # Slot der neuesten Umdrehung
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._async_waiters: list[tuple[int, asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._select(0)
+
+    def _select(self, slot: int):
+        self._slot = slot
+        self._n = 0
+        self._w_angle    = self.angle[slot]
+        self._w_distance = self.distance[slot]
+        self._w_quality  = self.quality[slot]
+        self._w_t        = self.t[slot]
+
+    def append(self, angle: float, distance: float, quality: int, t: float):
+        """Nur vom Scan-Thread aufrufen."""
+        n = self._n
+        if n >= self.max_points:
+            return
+        self._w_angle[n]    = angle
+        self._w_distance[n] = distance
+        self._w_quality[n]  = quality
+        self._w_t[n]        = t
+        self._n = n + 1
+
+    def commit(self) -> bool:
+        """Aktuellen Slot als neueste Umdrehung veröffentlichen und zum nächsten wechseln."""
+        if self._n == 0:
+            return False
+        slot = self._slot
+        with self._lock:
+            self.seq += 1
+            self.count[slot]    = self._n
+            self.seq_of[slot]   = self.seq
+            self.stamp_of[slot] = self._w_t[self._n - 1]
+            self._latest        = slot
+            self._cond.notify_all()
+            ready = []
+            if self._async_waiters:
+                ready = [w for w in self._async_waiters if w[0] < self.seq]
+                self._async_waiters = [w for w in self._async_waiters
+                                       if w[0] >= self.seq and not w[2].done()]
+                scan = self._view(slot)
+        self._select((slot + 1) % self.slots)
+
+        if ready:
+            for _, loop, fut in ready:
+                loop.call_soon_threadsafe(self._resolve, fut, scan)
+        return True
+
+    @staticmethod
+    def _resolve(fut: asyncio.Future, scan: Scan):
+        if not fut.done():
+            fut.set_result(scan)
+
+    def _view(self, slot: int) -> Scan:
+        n = int(self.count[slot])
+        return Scan(int(self.seq_of[slot]), float(self.stamp_of[slot]),
+                    self.angle[slot, :n], self.distance[slot, :n],
+                    self.quality[slot, :n], self.t[slot, :n])
+
+    def latest(self) -> Scan | None:
+        with self._lock:
+            if self._latest < 0:
+                return None
+            return self._view(self._latest)
+
+    def wait_newer(self, after_seq: int, timeout: float | None = None) -> Scan | None:
+        """Blockiert bis eine Umdrehung mit seq > after_seq vorliegt (None bei Timeout)."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.seq > after_seq, timeout):
+                return None
+            return self._view(self._latest)
+
+    async def wait_newer_async(self, after_seq: int, timeout: float | None = None) -> Scan | None:
+        """Wie wait_newer(), aber als awaitable für den asyncio-Loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.seq > after_seq:
+                return self._view(self._latest)
+            fut = loop.create_future()
+            self._async_waiters.append((after_seq, loop, fut))
+        try:
+            return await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+# Pose zu Zeitpunkten (monotonic) – liefert (x, y, theta) als Arrays oder Skalare
+PoseAt = Callable[[np.ndarray], tuple]
+
+
+@dataclass
+class ObstacleWatch:
+    """Hinderniswächter einer laufenden Fahrt (siehe Lidar.watch)."""
+    direction: int                                 # +1 vorwärts, -1 rückwärts, 0 drehen
+    pose: Callable[[], tuple[float, float, float]]  # liefert aktuelles (x, y, theta)
+    on_change: Callable[[bool], None]              # True = Hindernis, False = frei
+    loop: asyncio.AbstractEventLoop
+    pose_at: PoseAt | None = None                  # Pose zu Messzeitpunkten (optional)
+    stopped: bool = False
+
+
 class Lidar:
     def __init__(self, port: str = '/dev/serial/by-id/usb-Silicon_Labs_CP2102N_USB_to_UART_Bridge_Controller_ee5a3b581464ef1196f5daa9c169b110-if00-port0'):
         self.port = port
@@ -12,15 +159,22 @@ class Lidar:
         
         self.logger = logging.getLogger(__name__)
         
-        # Queue to store scan results
-        self.scan_results = queue.Queue(maxsize=10)
-        self.latest_scan_time = time()
+        # Ringpuffer für Scan-Ergebnisse
+        self.scans = ScanRing()
+        self._last_read_seq = 0
+        self._stop_key = (0, 0)   # (seq, direction) auf dem stop_motor beruht
+        self._stale_warned = False
         
         # Control flags
         self.running = False
         self.thread = None
         self.stop_motor = False
+        self.hits = 0   # Hindernis-Punkte der letzten Auswertung (Telemetrie)
         self.arms_up = False
+
+        # Aktiver Hinderniswächter – wird vom Scan-Thread pro Umdrehung ausgewertet
+        self._watch: ObstacleWatch | None = None
+        self._watch_lock = threading.Lock()
     
     def connect(self):
         """Connect to the Lidar device"""
@@ -52,42 +206,50 @@ class Lidar:
     
     def _scan_loop(self):
         self.logger.info("Scan loop started")
-        time_stamp = time_ns()
-        
-        # Reset scan data
-        current_scan_data = []
-        
-        
+        ring = self.scans
+
         while True:
             try:
                 scan_generator = self.lidar.start_scan()
-                for count, measurement in enumerate(scan_generator()):                 
-                    if measurement.start_flag:          
-                        try:
-                            self.scan_results.put_nowait(current_scan_data)
-                        except queue.Full:
-                            self.scan_results.get_nowait()
-                            self.scan_results.put_nowait(current_scan_data)
-
-                        current_scan_data = []
-                        
-                    if measurement.quality > 10 and measurement.distance > 0:  
-                        current_scan_data.append((measurement.angle, measurement.distance))
-            
+                for measurement in scan_generator():
+                    if measurement.start_flag and ring.commit():
+                        self._evaluate_watch()
+
+                    if measurement.quality > 10 and measurement.distance > 0:
+                        ring.append(measurement.angle, measurement.distance,
+                                    measurement.quality, monotonic())
+
             except Exception as e:
                 if not self.running:
                     break
-                
-    
-    def get_latest_scan(self):
+
+    def snapshot(self) -> Scan | None:
+        """Neueste vollständige Umdrehung (seq, stamp, Views) – verbraucht nichts."""
+        return self.scans.latest()
+
+    def wait_for_scan(self, after_seq: int = 0, timeout: float | None = None) -> Scan | None:
+        """Blockiert bis ein Scan mit seq > after_seq vorliegt. None bei Timeout."""
+        return self.scans.wait_newer(after_seq, timeout)
+
+    async def wait_for_scan_async(self, after_seq: int = 0, timeout: float | None = None) -> Scan | None:
+        """Awaitable Variante von wait_for_scan() für den asyncio-Loop."""
+        return await self.scans.wait_newer_async(after_seq, timeout)
+
+    def scan_age(self) -> float | None:
+        """Sekunden seit dem letzten Messpunkt des neuesten Scans (None = noch kein Scan)."""
+        scan = self.snapshot()
+        return None if scan is None else monotonic() - scan.stamp
+
+    def get_latest_scan(self) -> Scan | None:
         """
-        Get the latest scan result with timeout
-        Returns: List of (angle, distance) tuples or None if no data available
+        Get the latest scan result if this caller has not seen it yet
+        Returns: Scan (views into the ring) or None if no new data available
         """
-        try:
-            return self.scan_results.get_nowait()
-        except queue.Empty:
+        scan = self.snapshot()
+        if scan is None or scan.seq == self._last_read_seq:
             return None
+        self._last_read_seq = scan.seq
+        return scan
     
     def is_running(self):
         """Check if the Lidar thread is still running"""
@@ -122,55 +284,130 @@ class Lidar:
     CONE_DEG  = 60.0  # °   halber Kegelwinkel voraus/rückwärts (±60° = 120° gesamt)
     MIN_DIST  = 70    # mm  Eigenkörper ignorieren
     MIN_HITS  = 3     # Punkte für sicheren Treffer
+    STALE_S   = 0.5   # s   Scan älter → Warnung, Entscheidung beruht auf altem Scan
 
     @staticmethod
-    def _in_cone(angle, center_deg, half_deg):
-        diff = (angle - center_deg + 180) % 360 - 180
-        return abs(diff) <= half_deg
+    def _in_cone(angles, center_deg, half_deg):
+        diff = (angles - center_deg + 180) % 360 - 180
+        return np.abs(diff) <= half_deg
+
+    def _count_hits(self, angles: np.ndarray, dists: np.ndarray,
+                    x: float, y: float, theta: float, direction: int,
+                    t: np.ndarray | None = None, pose_at: PoseAt | None = None) -> int:
+        """Zählt Hindernis-Punkte eines Scans – Kegel, Stoppdistanz und Arena als Array-Masken.
 
-    def get_stop(self, x, y, theta, direction) -> bool:
-        """direction: +1 vorwärts, -1 rückwärts, 0 drehen → Vollkreis-Check."""
-        if self.latest_scan_time + 0.02 > time():
+        Mit t und pose_at wird jeder Punkt mit der Pose zu seinem Messzeitpunkt in
+        die Arena projiziert statt mit einer Pose für die ganze Umdrehung.
+        """
+        # Kegelfilter + Stoppdistanz: vorwärts mit Armen oben 20cm weiter
+        if direction > 0:
+            mask = self._in_cone(angles, 270, self.CONE_DEG)
+            stop_dist = self.STOP_DIST_ARMS_UP if self.arms_up else self.STOP_DIST
+        elif direction < 0:
+            mask = self._in_cone(angles, 90, self.CONE_DEG)
+            stop_dist = self.STOP_DIST
+        else:
+            mask = np.ones(angles.shape, dtype=bool)
+            stop_dist = self.STOP_DIST
+        mask &= (dists >= self.MIN_DIST) & (dists <= stop_dist)
+
+        # Arena-Projektion nur für die (wenigen) Kandidaten
+        idx = np.flatnonzero(mask)
+        if pose_at is not None and t is not None and len(idx):
+            x, y, theta = pose_at(t[idx])
+        arena_rad = np.radians(angles[idx] + theta)
+        d = dists[idx]
+        arena_x = -d * np.sin(arena_rad) + x
+        arena_y =  d * np.cos(arena_rad) + y
+        inside = (arena_x >= 0) & (arena_x <= 3000) & (arena_y >= 0) & (arena_y <= 2000)
+        return int(np.count_nonzero(inside))
+
+    # ── Ereignisgesteuerter Stopp ─────────────────────────────────────────
+
+    def watch(self, direction: int, pose: Callable[[], tuple[float, float, float]],
+              on_change: Callable[[bool], None], pose_at: PoseAt | None = None) -> ObstacleWatch:
+        """Hinderniswächter für die laufende Fahrt registrieren (aus dem asyncio-Loop).
+
+        Der Scan-Thread prüft jede neue Umdrehung und ruft on_change(True/False)
+        nur bei Zustandswechseln auf – per call_soon_threadsafe im asyncio-Loop.
+        Der aktuelle Scan wird sofort geprüft, damit ein schon stehendes
+        Hindernis nicht erst eine Umdrehung später erkannt wird. Mit pose_at werden
+        die Punkte mit der Pose zu ihrem Messzeitpunkt projiziert (siehe _count_hits).
+        """
+        watch = ObstacleWatch(direction, pose, on_change, asyncio.get_running_loop(), pose_at)
+        age = self.scan_age()
+        if age is None or age > self.STALE_S:
+            self.logger.warning("Lidar liefert keine aktuellen Scans – Fahrt ohne Hinderniserkennung")
+        with self._watch_lock:
+            self._watch = watch
+        self._evaluate_watch()
+        return watch
+
+    def set_direction(self, watch: ObstacleWatch, direction: int):
+        """Fahrtrichtung eines laufenden Wächters ändern und sofort neu prüfen (wie watch())."""
+        with self._watch_lock:
+            if watch.direction == direction:
+                return
+            watch.direction = direction
+        self._evaluate_watch()
+
+    def unwatch(self, watch: ObstacleWatch | None = None):
+        """Wächter entfernen (nur wenn es noch der angegebene ist)."""
+        with self._watch_lock:
+            if watch is None or self._watch is watch:
+                self._watch = None
+
+    def _evaluate_watch(self):
+        with self._watch_lock:
+            watch = self._watch
+            if watch is None:
+                return
+            scan = self.snapshot()
+            if scan is None or len(scan) == 0:
+                return
+            x, y, theta = watch.pose()
+            self.hits = self._count_hits(scan.angle, scan.distance, x, y, theta,
+                                         watch.direction, scan.t, watch.pose_at)
+            stopped = self.hits >= self.MIN_HITS
+            self.stop_motor = stopped
+            if stopped == watch.stopped:
+                return
+            watch.stopped = stopped
+        watch.loop.call_soon_threadsafe(self._dispatch, watch, stopped)
+
+    def _dispatch(self, watch: ObstacleWatch, stopped: bool):
+        # Läuft im asyncio-Loop – verworfen, falls die Fahrt inzwischen vorbei ist
+        if self._watch is watch:
+            watch.on_change(stopped)
+
+    def get_stop(self, x, y, theta, direction, pose_at: PoseAt | None = None) -> bool:
+        """direction: +1 vorwärts, -1 rückwärts, 0 drehen → Vollkreis-Check.
+
+        pose_at (optional): Pose zu Messzeitpunkten, ersetzt x/y/theta für die Arena-Projektion.
+
+        Wertet nur neue Scans aus; bei gleichem seq und gleicher Richtung wird die
+        letzte Entscheidung zurückgegeben. Ist der neueste Scan älter als STALE_S, wird gewarnt.
+        """
+        latest_scan = self.snapshot()
+        if latest_scan is None:
             return self.stop_motor
 
-        latest_scan = self.get_latest_scan()
-        self.latest_scan_time = time()
+        stale = monotonic() - latest_scan.stamp > self.STALE_S
+        if stale and not self._stale_warned:
+            self.logger.warning(f"Lidar-Scan #{latest_scan.seq} veraltet – Stopp-Entscheidung auf altem Scan")
+        self._stale_warned = stale
 
-        if not latest_scan:
+        key = (latest_scan.seq, direction)
+        if key == self._stop_key or len(latest_scan) == 0:
             return self.stop_motor
+        self._stop_key = key
 
-        self.stop_motor = False
-        obstacles = 0
-        for angle, distance in latest_scan:
-            if distance < self.MIN_DIST:
-                continue
-
-            # Kegelfilter + Stoppdistanz: vorwärts mit Armen oben 20cm weiter
-            if direction > 0:
-                if not self._in_cone(angle, 270, self.CONE_DEG):
-                    continue
-                stop_dist = self.STOP_DIST_ARMS_UP if self.arms_up else self.STOP_DIST
-            elif direction < 0:
-                if not self._in_cone(angle, 90, self.CONE_DEG):
-                    continue
-                stop_dist = self.STOP_DIST
-            else:
-                stop_dist = self.STOP_DIST
-
-            if distance > stop_dist:
-                continue
-
-            arena_rad = (angle + theta) * math.pi / 180
-            arena_x = -distance * math.sin(arena_rad) + x
-            arena_y =  distance * math.cos(arena_rad) + y
-            if not (0 <= arena_x <= 3000 and 0 <= arena_y <= 2000):
-                continue
-
-            self.logger.info(f'Obstacle: angle={angle:.1f}° dist={distance:.0f}mm')
-            obstacles += 1
-            if obstacles >= self.MIN_HITS:
-                self.stop_motor = True
-                break
+        hits = self._count_hits(latest_scan.angle, latest_scan.distance, x, y, theta, direction,
+                                latest_scan.t, pose_at)
+        self.hits = hits
+        self.stop_motor = hits >= self.MIN_HITS
+        if self.stop_motor:
+            self.logger.info(f'Obstacle: {hits} Punkte im Stoppbereich')
 
         return self.stop_motor
 
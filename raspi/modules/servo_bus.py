@@ -0,0 +1,139 @@
+"""
+Servo-Bus-Scheduler: ein Thread besitzt den STServo-Port, alle anderen reichen
+Transaktionen über eine Prioritäts-Queue ein und bekommen ein Future zurück.
+
+Damit kann PortHandler.is_using nie mehr "busy" sein (es gibt nur einen
+Nutzer), und Notfall-Posen überholen alles, was noch in der Queue wartet.
+"""
+
+import asyncio
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from modules.STservo_sdk import COMM_SUCCESS
+
+
+class ServoBus:
+    # Prioritäten – kleiner = früher
+    EMERGENCY = 0   # z.B. alle_auf bei Spielende; verwirft wartende Befehle
+    COMMAND   = 1   # normale Posen / Einzelbefehle
+    TELEMETRY = 2   # Poller, nur wenn nichts anderes ansteht
+
+    def __init__(self, port_handler):
+        self.port_handler = port_handler
+        self.logger = logging.getLogger(__name__)
+
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._seq = itertools.count()   # FIFO innerhalb einer Priorität
+        self._epoch = 0                 # erhöht bei jedem Notfall-Befehl
+
+        self._poller: Callable[[], None] | None = None
+        self._poll_period = 0.0
+        self._next_poll = 0.0
+
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='servo-bus', daemon=True)
+        self.thread.start()
+
+    # ── API ───────────────────────────────────────────────────────────────
+
+    def submit(self, fn: Callable[..., Any], *args, priority: int = COMMAND) -> Future:
+        """fn(*args) im Bus-Thread ausführen. Future liefert den Rückgabewert.
+
+        Ein EMERGENCY-Befehl verwirft alle noch wartenden COMMAND-Befehle
+        (deren Futures werden gecancelt), damit sie die Notfall-Pose nicht
+        gleich wieder überschreiben.
+        """
+        fut: Future = Future()
+        if not self.running:
+            fut.set_exception(RuntimeError("Servo-Bus geschlossen"))
+            return fut
+        if priority == self.EMERGENCY:
+            self._epoch += 1
+        self._queue.put((priority, next(self._seq), self._epoch, fn, args, fut))
+        return fut
+
+    def call(self, fn: Callable[..., Any], *args, priority: int = COMMAND) -> Any:
+        """Wie submit(), wartet aber blockierend auf das Ergebnis."""
+        if threading.current_thread() is self.thread:
+            return fn(*args)
+        return self.submit(fn, *args, priority=priority).result()
+
+    async def run(self, fn: Callable[..., Any], *args, priority: int = COMMAND) -> Any:
+        """Awaitable Variante von call() für den asyncio-Loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args, priority=priority))
+
+    def set_poller(self, fn: Callable[[], None] | None, period: float = 0.0):
+        """fn alle period Sekunden im Bus-Thread ausführen, wenn die Queue leer ist."""
+        self._poller = fn
+        self._poll_period = period
+        self._next_poll = time.monotonic()
+        self._queue.put((self.TELEMETRY, next(self._seq), self._epoch, None, (), None))  # aufwecken
+
+    def close(self):
+        self.running = False
+        self._queue.put((self.EMERGENCY, next(self._seq), self._epoch, None, (), None))
+        self.thread.join(timeout=1.0)
+
+    # ── Bus-Thread ────────────────────────────────────────────────────────
+
+    def _run(self):
+        while self.running:
+            timeout = None
+            if self._poller:
+                timeout = max(0.0, self._next_poll - time.monotonic())
+            try:
+                priority, _, epoch, fn, args, fut = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._poll()
+                continue
+            if fn is None:
+                continue
+            if priority > self.EMERGENCY and epoch < self._epoch:
+                fut.cancel()
+                self.logger.info("Servo-Befehl verworfen (Notfall-Pose hat Vorrang)")
+                continue
+            if not fut.set_running_or_notify_cancel():
+                continue
+            self._execute(fn, args, fut)
+            if self._poller and time.monotonic() >= self._next_poll and self._queue.empty():
+                self._poll()
+
+        # Noch wartende Aufrufer nicht hängen lassen
+        while True:
+            try:
+                *_, fut = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if fut is not None:
+                fut.cancel()
+
+    def _execute(self, fn: Callable[..., Any], args: tuple, fut: Future):
+        # Einziger Nutzer des Ports – ein hängengebliebenes is_using ist hier nie berechtigt
+        self.port_handler.is_using = False
+        try:
+            result = fn(*args)
+        except Exception as e:
+            self.logger.error(f"Servo-Transaktion fehlgeschlagen: {e}")
+            fut.set_exception(e)
+            return
+        # Transaktionen liefern ihr COMM-Ergebnis – Fehler sichtbar machen statt verschlucken
+        if isinstance(result, int) and result != COMM_SUCCESS:
+            self.logger.warning(f"Servo-Transaktion {getattr(fn, '__name__', fn)}: Ergebnis {result}")
+        fut.set_result(result)
+
+    def _poll(self):
+        poller = self._poller
+        if poller is None:
+            return
+        self._next_poll = time.monotonic() + self._poll_period
+        self.port_handler.is_using = False
+        try:
+            poller()
+        except Exception as e:
+            self.logger.error(f"Servo-Telemetrie fehlgeschlagen: {e}")
@@ -1,6 +1,13 @@
 import time
+import asyncio
+import logging
+import threading
+import numpy as np
+from concurrent.futures import Future
+from dataclasses import dataclass
 from modules.STservo_sdk import *
-from modules.STservo_sdk.sts import STS_TORQUE_ENABLE, STS_MODE
+from modules.servo_bus import ServoBus
+from modules.STservo_sdk.sts import STS_TORQUE_ENABLE, STS_MODE, STS_PRESENT_POSITION_L, STS_MOVING
 
 BAUDRATE         = 1000000
 STS_MOVING_SPEED = 3000
@@ -9,133 +16,379 @@ STS_MOVING_ACC   = 80
 WINKER_STEPS = 1707  # 150° in Schritten (150/360 * 4096)
 
 
+@dataclass(frozen=True, slots=True)
+class ServoSnapshot:
+    """Ein Telemetrie-Zyklus aller Servos (Kopie, darf behalten werden).
+
+    data[i] gehört zu ids[i], Spalten siehe ServoTelemetry.POS … ERROR.
+    stamp[i] = monotonic() des letzten erfolgreichen Lesens von ids[i] (0 = nie).
+    """
+    seq: int
+    ids: tuple[int, ...]
+    data: np.ndarray    # int32 (n, 7)
+    stamp: np.ndarray   # float64 (n,)
+
+
+@dataclass(eq=False, slots=True)
+class _Waiter:
+    idx: np.ndarray                  # Zeilen in ServoTelemetry._data
+    since: float                     # monotonic() nach dem Befehl – ältere Zyklen zählen nicht
+    goal: np.ndarray                 # Zielposition je Servo, nan = unbekannt
+    moved: np.ndarray                # STS_MOVING = 1 seit since gesehen
+    loop: asyncio.AbstractEventLoop
+    future: asyncio.Future
+
+
+class ServoTelemetry:
+    """Hintergrund-Poller: liest alle Servos per GroupSyncRead in einer Transaktion.
+
+    Pro Zyklus ein Sync-Read über Adresse 56–66 (Position, Speed, Last,
+    Spannung, Temperatur, Moving), ausgeführt vom ServoBus mit niedrigster
+    Priorität, wenn keine Befehle anstehen. Das Ergebnis liegt als ServoSnapshot bereit;
+    wait_reached() wartet im asyncio-Loop, bis die Servos STS_MOVING = 0 melden.
+    """
+    PERIOD   = 0.05   # s  → 20 Hz
+    TEMP_WARN = 65    # °C
+    LOAD_WARN = 800   # von 1000 (0.1 %)
+    POS_TOLERANCE = 20   # Schritte (~2°), "am Ziel" für Servos, die sich nie bewegen mussten
+
+    # Spalten in ServoSnapshot.data
+    POS, SPEED, LOAD, VOLT, TEMP, MOVING, ERROR = range(7)
+
+    _START  = STS_PRESENT_POSITION_L
+    _LENGTH = STS_MOVING - STS_PRESENT_POSITION_L + 1   # 11 Bytes
+
+    def __init__(self, packet_handler, bus: ServoBus, ids: list[int]):
+        self.ph = packet_handler
+        self.bus = bus
+        self.ids = tuple(ids)
+        self.logger = logging.getLogger(__name__)
+
+        self.gsr = GroupSyncRead(packet_handler, self._START, self._LENGTH)
+        for sid in self.ids:
+            self.gsr.addParam(sid)
+
+        self._data  = np.zeros((len(self.ids), 7), dtype=np.int32)
+        self._stamp = np.zeros(len(self.ids), dtype=np.float64)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._waiters: list[_Waiter] = []
+        self._warned: set[tuple[int, str]] = set()
+
+        self.running = False
+
+    def start(self):
+        self.running = True
+        self.bus.set_poller(self.poll_once, self.PERIOD)
+
+    def stop(self):
+        self.running = False
+        self.bus.set_poller(None)
+
+    def poll_once(self):
+        """Ein Sync-Read-Zyklus (im Bus-Thread): alle Servos lesen, Snapshot + Wartende aktualisieren."""
+        # Nur in diesem Zyklus dekodierte Servos sind frisch – fehlt die Antwort, bleibt sonst die alte stehen
+        self.gsr.clearData()
+        self.gsr.txRxPacket()
+        now = time.monotonic()
+        rows = []
+        for i, sid in enumerate(self.ids):
+            ok, error = self.gsr.isAvailable(sid, self._START, self._LENGTH)
+            if not ok:
+                continue
+            rows.append((i, self._decode(sid, error)))
+
+        with self._lock:
+            for i, row in rows:
+                self._data[i] = row
+                self._stamp[i] = now
+            self._seq += 1
+            ready, waiting = [], []
+            for w in self._waiters:
+                if not w.future.done():
+                    (ready if self._reached(w) else waiting).append(w)
+            self._waiters = waiting
+        for w in ready:
+            w.loop.call_soon_threadsafe(self._resolve, w.future)
+        for i, row in rows:
+            self._check(self.ids[i], row)
+
+    def _decode(self, sid: int, error: int) -> tuple[int, ...]:
+        g, ph = self.gsr, self.ph
+        return (ph.sts_tohost(g.getData(sid, STS_PRESENT_POSITION_L, 2), 15),
+                ph.sts_tohost(g.getData(sid, STS_PRESENT_SPEED_L, 2), 15),
+                ph.sts_tohost(g.getData(sid, STS_PRESENT_LOAD_L, 2), 10),
+                g.getData(sid, STS_PRESENT_VOLTAGE, 1),
+                g.getData(sid, STS_PRESENT_TEMPERATURE, 1),
+                g.getData(sid, STS_MOVING, 1),
+                error)
+
+    def _check(self, sid: int, row: tuple[int, ...]):
+        """Überlast/Übertemperatur einmal pro Auftreten loggen."""
+        problems = {
+            'Überlast':       abs(row[self.LOAD]) >= self.LOAD_WARN or row[self.ERROR] & ERRBIT_OVERLOAD,
+            'Übertemperatur': row[self.TEMP] >= self.TEMP_WARN or row[self.ERROR] & ERRBIT_OVERHEAT,
+        }
+        for name, active in problems.items():
+            key = (sid, name)
+            if active and key not in self._warned:
+                self._warned.add(key)
+                self.logger.warning(f"Servo {sid}: {name} (Last {row[self.LOAD]}, {row[self.TEMP]} °C)")
+            elif not active:
+                self._warned.discard(key)
+
+    def snapshot(self) -> ServoSnapshot:
+        with self._lock:
+            return ServoSnapshot(self._seq, self.ids, self._data.copy(), self._stamp.copy())
+
+    def _reached(self, w: _Waiter) -> bool:
+        # Nur Messungen nach dem Befehl zählen, sonst meldet ein alter Zyklus "steht".
+        # Auch der erste Zyklus danach kann noch vor dem Anlaufen liegen (STS_MOVING = 0):
+        # "steht" zählt erst, wenn der Servo seitdem gefahren ist oder schon am Ziel steht.
+        fresh = self._stamp[w.idx] > w.since
+        moving = self._data[w.idx, self.MOVING] != 0
+        w.moved |= fresh & moving
+        if not fresh.all() or moving.any():
+            return False
+        with np.errstate(invalid='ignore'):
+            at_goal = np.abs(self._data[w.idx, self.POS] - w.goal) <= self.POS_TOLERANCE
+        return bool(np.all(w.moved | at_goal))
+
+    @staticmethod
+    def _resolve(fut: asyncio.Future):
+        if not fut.done():
+            fut.set_result(True)
+
+    async def wait_reached(self, ids, timeout: float, goals: dict[int, int | None] | None = None) -> bool:
+        """Wartet, bis alle ids nach dem Befehl gefahren sind (oder am Ziel aus goals stehen)
+        und STS_MOVING = 0 melden. False bei Timeout."""
+        ids = [sid for sid in ids if sid in self.ids]
+        if not self.running or not ids:
+            await asyncio.sleep(timeout)
+            return False
+        goals = goals or {}
+        loop = asyncio.get_running_loop()
+        w = _Waiter(np.array([self.ids.index(sid) for sid in ids], dtype=np.intp), time.monotonic(),
+                    np.array([np.nan if goals.get(sid) is None else goals[sid] for sid in ids]),
+                    np.zeros(len(ids), dtype=bool), loop, loop.create_future())
+        with self._lock:
+            self._waiters.append(w)
+        try:
+            return await asyncio.wait_for(w.future, timeout)
+        except asyncio.TimeoutError:
+            return False   # wird im nächsten Zyklus verworfen (Future ist dann done)
+
+
 class Servos:
     PORT = "/dev/serial/by-id/usb-1a86_USB_Single_Serial_5A46083059-if00"
     ALL_IDS = [1, 2, 3, 6, 7, 8, 9, 11]
+    RETRIES = 1   # Wiederholungen bei fehlender/kaputter Antwort (Timeout passt sich der Latenz an)
 
     def __init__(self, port: str = PORT):
         self.port_handler   = PortHandler(port)
+        self.port_handler.retries = self.RETRIES
         self.packet_handler = sts(self.port_handler)
         if not self.port_handler.openPort():
             raise RuntimeError(f"Servo port nicht gefunden: {port}")
         if not self.port_handler.setBaudRate(BAUDRATE):
             raise RuntimeError("Servo baudrate konnte nicht gesetzt werden")
+
+        # Alle Transaktionen laufen über den Bus-Thread (Prioritäts-Queue, Futures)
+        self.bus       = ServoBus(self.port_handler)
+        self.telemetry = ServoTelemetry(self.packet_handler, self.bus, self.ALL_IDS)
+        self.last_ids: tuple[int, ...] = ()   # Servos des letzten Fahrbefehls (für wait_reached)
+        self.last_goals: dict[int, int | None] = {}   # Zielpositionen dazu, None = relativ
+        self.last_cmd: Future | None = None
         self.detach_all()
 
-    def write_servo(self, id: int, goal_position: int):
-        self.packet_handler.WritePosEx(id, goal_position, STS_MOVING_SPEED, STS_MOVING_ACC)
+    def bus_stats(self) -> dict:
+        """Pakete, Timeouts, kaputte Antworten, Wiederholungen, aktuelle Latenz (ms)."""
+        return self.port_handler.getStats()
+
+    def close(self):
+        self.telemetry.stop()
+        self.bus.close()
+        self.port_handler.closePort()
+
+    # ── Transaktionen (laufen im Bus-Thread, liefern das COMM-Ergebnis) ───
+
+    def _tx_write(self, sid: int, goal_position: int) -> int:
+        return self.packet_handler.WritePosEx(sid, goal_position, STS_MOVING_SPEED, STS_MOVING_ACC)[0]
+
+    def _tx_relative(self, sid: int, delta: int) -> int:
+        self.packet_handler.write1ByteTxRx(sid, STS_MODE, 0)
+        self.packet_handler.write1ByteTxRx(sid, STS_TORQUE_ENABLE, 1)
+        pos, result, _ = self.packet_handler.ReadPos(sid)
+        if result != COMM_SUCCESS:
+            return result
+        return self._tx_write(sid, pos + delta)
+
+    def _tx_torque(self, sid: int, on: bool) -> int:
+        return self.packet_handler.write1ByteTxRx(sid, STS_TORQUE_ENABLE, int(on))[0]
+
+    def _tx_pose(self, targets: dict[int, int]) -> int:
+        gsw = self.packet_handler.groupSyncWrite
+        gsw.clearParam()
+        for sid, pos in targets.items():
+            self.packet_handler.SyncWritePosEx(sid, pos, STS_MOVING_SPEED, STS_MOVING_ACC)
+        return gsw.txPacket()
+
+    # ── Befehle (nicht blockierend, Future mit COMM-Ergebnis) ─────────────
+
+    def _motion(self, goals: dict[int, int | None], fut: Future) -> Future:
+        self.last_ids, self.last_goals, self.last_cmd = tuple(goals), goals, fut
+        return fut
 
-    def write_servo_relative(self, id: int, delta: int):
-        self.packet_handler.write1ByteTxRx(id, STS_MODE, 0)
-        self.packet_handler.write1ByteTxRx(id, STS_TORQUE_ENABLE, 1)
-        pos, result, _ = self.packet_handler.ReadPos(id)
-        if result != 0:
-            return
-        self.packet_handler.WritePosEx(id, pos + delta, STS_MOVING_SPEED, STS_MOVING_ACC)
+    def write_servo(self, id: int, goal_position: int) -> Future:
+        return self._motion({id: goal_position}, self.bus.submit(self._tx_write, id, goal_position))
+
+    def write_servo_relative(self, id: int, delta: int) -> Future:
+        return self._motion({id: None}, self.bus.submit(self._tx_relative, id, delta))
+
+    def set_torque(self, sid: int, on: bool) -> Future:
+        return self.bus.submit(self._tx_torque, sid, on)
 
     def detach_all(self):
         """Torque aller Servos deaktivieren (detach)."""
         for sid in self.ALL_IDS:
-            self.packet_handler.write1ByteTxRx(sid, STS_TORQUE_ENABLE, 0)
+            self.set_torque(sid, False)
 
     def attach_all(self):
-        """Torque aller Servos nacheinander aktivieren (attach)."""
+        """Torque aller Servos nacheinander aktivieren (attach) – blockiert ~0.8 s."""
         for sid in self.ALL_IDS:
-            self.packet_handler.write1ByteTxRx(sid, STS_TORQUE_ENABLE, 1)
+            self.set_torque(sid, True).result()
             time.sleep(0.1)
 
-    # ── 4 Frontgreifer (von links nach rechts: ID 2, 1, 11, 9) ────────────
+    async def wait_reached(self, timeout: float, ids=None) -> bool:
+        """Wartet, bis die Servos des letzten Befehls (oder ids) ihr Ziel erreicht haben.
+
+        Ohne laufende Telemetrie wird einfach timeout lang gewartet (False).
+        """
+        deadline = time.monotonic() + timeout
+        if self.last_cmd is not None:
+            # Erst warten, bis der Befehl auf dem Bus war – sonst zählt ein Zyklus davor als "steht"
+            done, _ = await asyncio.wait({asyncio.wrap_future(self.last_cmd)}, timeout=timeout)
+            if not done:
+                return False
+        remaining = max(0.0, deadline - time.monotonic())
+        return await self.telemetry.wait_reached(self.last_ids if ids is None else ids, remaining,
+                                                 self.last_goals)
+
+    # ── Posen ─────────────────────────────────────────────────────────────
+    # Jede Pose ist {Servo-ID: Zielposition} und geht als ein GroupSyncWrite-
+    # Paket raus – alle beteiligten Servos starten gleichzeitig.
+
+    # 4 Frontgreifer von links nach rechts: ID 2, 1, 11, 9  →  (auf, zu)
+    GRIPPER_IDS = [2, 1, 11, 9]
+    GRIP = {
+        2:  (1048, 2000),
+        1:  (1500, 2500),
+        11: (1048, 2100),
+        9:  (1048, 2048),
+    }
+
+    # Lift-Modul (ID 3 = Lift A, ID 6 = Lift B)
+    LIFT_A = 3
+    LIFT_B = 6
+    LIFT_A_HOCH   = 0    # TODO: kalibrieren
+    LIFT_A_RUNTER = 0    # TODO: kalibrieren
+    LIFT_B_HOCH   = 0    # TODO: kalibrieren
+    LIFT_B_RUNTER = 0    # TODO: kalibrieren
+
+    # Winker 1 = ID 7 = linker Winker, Winker 2 = ID 8 = rechter Winker
+    WINKER1_OBEN   = 2012
+    WINKER1_UNTEN  = 3473
+    WINKER2_OBEN   = 980
+    WINKER2_UNTEN  = 1958
+
+    POSES: dict[str, dict[int, int]] = {
+        'auf':       {sid: auf for sid, (auf, _) in GRIP.items()},
+        'zu':        {sid: zu for sid, (_, zu) in GRIP.items()},
+        # Mittelposition zwischen auf und zu – für Fahrt
+        'driving':   {sid: (auf + zu) // 2 for sid, (auf, zu) in GRIP.items()},
+        'innen_zu':  {1: GRIP[1][1], 11: GRIP[11][1]},
+        'aussen_zu': {2: GRIP[2][1], 9: GRIP[9][1]},
+        'lift_hoch':     {LIFT_A: LIFT_A_HOCH, LIFT_B: LIFT_B_HOCH},
+        'lift_runter':   {LIFT_A: LIFT_A_RUNTER, LIFT_B: LIFT_B_RUNTER},
+        'winker1_hoch':   {7: WINKER1_OBEN},
+        'winker1_runter': {7: WINKER1_UNTEN},
+        'winker2_hoch':   {8: WINKER2_OBEN},
+        'winker2_runter': {8: WINKER2_UNTEN},
+    }
+    POSES['home'] = {**POSES['auf'], **POSES['lift_runter'], **POSES['winker2_hoch']}
+
+    def write_pose(self, targets: dict[int, int], priority: int = ServoBus.COMMAND) -> Future:
+        """Mehrere Servos mit einem Sync-Write-Paket anfahren (kein Status-Paket)."""
+        return self._motion(dict(targets),
+                            self.bus.submit(self._tx_pose, dict(targets), priority=priority))
+
+    def pose(self, name: str, priority: int = ServoBus.COMMAND) -> Future:
+        return self.write_pose(self.POSES[name], priority)
+
+    def emergency(self, name: str = 'auf') -> Future:
+        """Notfall-Pose: überholt und verwirft alle noch wartenden Servo-Befehle."""
+        return self.pose(name, ServoBus.EMERGENCY)
+
+    # ── 4 Frontgreifer ────────────────────────────────────────────────────
+
+    def grip(self, indices: list[int], pos: int):
+        """Greifer an den Positionen indices (0 = ganz links … 3 = ganz rechts) gemeinsam. 1: auf, 2: zu"""
+        self.write_pose({self.GRIPPER_IDS[i]: self.GRIP[self.GRIPPER_IDS[i]][pos - 1] for i in indices})
 
     def grip_links_aussen(self, pos: int):
         """ID 2 – ganz links. 1: auf, 2: zu"""
-        match pos:
-            case 1: self.write_servo(2, 1048)
-            case 2: self.write_servo(2, 2000)
+        self.grip([0], pos)
 
     def grip_links_innen(self, pos: int):
         """ID 1 – zweiter von links. 1: auf, 2: zu"""
-        match pos:
-            case 1: self.write_servo(1, 1500)
-            case 2: self.write_servo(1, 2500)
+        self.grip([1], pos)
 
     def grip_rechts_innen(self, pos: int):
         """ID 11 – zweiter von rechts. 1: auf, 2: zu"""
-        match pos:
-            case 1: self.write_servo(11, 1048)
-            case 2: self.write_servo(11, 2100)
+        self.grip([2], pos)
 
     def grip_rechts_aussen(self, pos: int):
         """ID 9 – ganz rechts. 1: auf, 2: zu"""
-        match pos:
-            case 1: self.write_servo(9, 1048)
-            case 2: self.write_servo(9, 2048)
+        self.grip([3], pos)
 
     def alle_auf(self):
-        self.grip_links_aussen(1)
-        self.grip_links_innen(1)
-        self.grip_rechts_innen(1)
-        self.grip_rechts_aussen(1)
+        self.pose('auf')
 
     def alle_zu(self):
-        self.grip_links_aussen(2)
-        self.grip_links_innen(2)
-        self.grip_rechts_innen(2)
-        self.grip_rechts_aussen(2)
+        self.pose('zu')
 
     def alle_driving(self):
-        """Mittelposition zwischen auf und zu – für Fahrt."""
-        self.write_servo(2,  1524)  # (1048+2000)//2
-        self.write_servo(1,  2000)  # (1500+2500)//2
-        self.write_servo(11, 1574)  # (1048+2100)//2
-        self.write_servo(9,  1548)  # (1048+2048)//2
+        self.pose('driving')
 
     def innen_zu(self):
-        self.grip_links_innen(2)
-        self.grip_rechts_innen(2)
+        self.pose('innen_zu')
 
     def aussen_zu(self):
-        self.grip_links_aussen(2)
-        self.grip_rechts_aussen(2)
+        self.pose('aussen_zu')
 
-    # ── Lift-Modul (ID 3 = Lift A, ID 6 = Lift B) ────────────────────────
-    LIFT_A = 3
-    LIFT_B = 6
-    LIFT_A_HOCH   = 0    # TODO: kalibrieren
-    LIFT_A_RUNTER = 0    # TODO: kalibrieren
-    LIFT_B_HOCH   = 0    # TODO: kalibrieren
-    LIFT_B_RUNTER = 0    # TODO: kalibrieren
+    # ── Lift ──────────────────────────────────────────────────────────────
 
     def lift_hoch(self):
-        self.write_servo(self.LIFT_A, self.LIFT_A_HOCH)
-        self.write_servo(self.LIFT_B, self.LIFT_B_HOCH)
+        self.pose('lift_hoch')
 
     def lift_runter(self):
-        self.write_servo(self.LIFT_A, self.LIFT_A_RUNTER)
-        self.write_servo(self.LIFT_B, self.LIFT_B_RUNTER)
+        self.pose('lift_runter')
 
     # ── Winker (2 unabhängige Servos) ─────────────────────────────────────
-    # Winker 1 = ID 7 = linker Winker
-    # Winker 2 = ID 8 = rechter Winker
-    WINKER1_OBEN   = 2012
-    WINKER1_UNTEN  = 3473
-    WINKER2_OBEN   = 980
-    WINKER2_UNTEN  = 1958
 
     def winker1_runter(self):
-        self.write_servo(7, self.WINKER1_UNTEN)
+        self.pose('winker1_runter')
 
     def winker1_hoch(self):
-        self.write_servo(7, self.WINKER1_OBEN)
+        self.pose('winker1_hoch')
 
     def winker2_runter(self):
-        self.write_servo(8, self.WINKER2_UNTEN)
+        self.pose('winker2_runter')
 
     def winker2_hoch(self):
-        self.write_servo(8, self.WINKER2_OBEN)
+        self.pose('winker2_hoch')
 
     # ── Home-Position ──────────────────────────────────────────────────────
 
     def home(self):
-        self.alle_auf()
-        self.lift_runter()
-        self.winker2_hoch()
+        self.pose('home')
@@ -0,0 +1,247 @@
+"""
+Taktik-Compiler: Aktions-Strings aus TACTICS → unveränderliche Action-Objekte.
+
+Wird einmal beim Start bzw. beim Teamwechsel ausgeführt. Dabei werden alle
+Strings geparst und geprüft (Fehler → TacticError, bevor der Roboter scharf
+ist) und die Spiegelung für Blau schon eingerechnet. Task führt danach nur noch
+fertige Argumente per Index aus – kein Parsen, kein deepcopy mehr.
+
+Syntax der einzelnen Aktionen: siehe ACTIONS.md.
+"""
+
+from dataclasses import dataclass
+
+from modules.esp32 import ESP32
+
+COLORS = ('blue', 'yellow')
+
+# Aufeinanderfolgende Fahrbefehle dieser Art werden gepipelined (ESP32.WINDOW)
+MOTION_OPS = ('dd', 'ta')
+
+# Aktionen ohne Argument
+_PLAIN_OPS = frozenset({'gp', 'es', 'hm', 'he', 'hg', 'co', 'cg', 'gr', 'go',
+                        'gi', 'ga', 'gd', 'lh', 'lr', 'ic'})
+
+
+class TacticError(ValueError):
+    """Ungültiger Aktions-String in einer Taktik."""
+
+
+@dataclass(frozen=True, slots=True)
+class Action:
+    op: str                  # zweistelliger Code, z.B. 'dd'
+    args: tuple = ()         # fertig geparst und (für Blau) gespiegelt
+    src: str = ''            # Original-String für Logs
+    chain: bool = False      # dd/ta direkt nach dd/ta → gemeinsam senden
+
+    def __str__(self):
+        return self.src
+
+
+def _mirror(x: int, y: int, theta: int | None = None):
+    """Spiegelt Koordinaten für das gelbe Team (x-Achse, Mitte = 1500mm)."""
+    mx = 3000 - x
+    if theta is not None:
+        mt = int((180 - theta) % 360)
+        return mx, y, mt
+    return mx, y
+
+
+def _numbers(text: str, n_min: int, n_max: int, conv=int) -> tuple:
+    parts = text.split(';') if text else []
+    if not n_min <= len(parts) <= n_max:
+        want = n_min if n_min == n_max else f"{n_min}–{n_max}"
+        raise TacticError(f"erwartet {want} Werte, bekommen {len(parts)}")
+    try:
+        return tuple(conv(p) for p in parts)
+    except ValueError:
+        raise TacticError(f"keine Zahl: '{text}'") from None
+
+
+def parse_action(msg: str) -> Action:
+    """Einen Aktions-String parsen (ohne Spiegelung)."""
+    op, rest = msg[:2], msg[2:]
+    match op:
+        case 'dd' | 'ta' | 'tt' | 'ip':
+            args = _numbers(rest, 1, 1)
+        case 'dp':
+            args = _numbers(rest, 2, 3)
+        case 'sp':
+            args = _numbers(rest, 3, 3)
+        case 'ws':
+            args = _numbers(rest, 2, 2)
+        case 'wt':
+            args = _numbers(rest, 1, 1, float)
+        case 'st':  # stN – N wird ignoriert
+            args = ()
+        case 'w1' | 'w2':
+            if rest not in ('h', 'r'):
+                raise TacticError("erwartet w1h/w1r bzw. w2h/w2r")
+            args = (rest == 'h',)
+        case _ if op in _PLAIN_OPS:
+            if rest:
+                raise TacticError("erwartet keine Argumente")
+            args = ()
+        case _:
+            raise TacticError("unbekannte Aktion")
+    return Action(op, args, msg)
+
+
+def _apply_color(action: Action, color: str) -> Action:
+    """Spiegelung wie früher zur Laufzeit in Task – jetzt einmal vorab."""
+    if color != 'blue':
+        return action
+    op, args = action.op, action.args
+    match op:
+        case 'ta':
+            args = (-args[0],)
+        case 'tt':
+            args = (_mirror(0, 0, args[0])[2],)
+        case 'dp' | 'sp':
+            args = _mirror(*args)
+        case _:
+            return action
+    return Action(op, args, action.src)
+
+
+def _with_chain(program: list[Action]) -> tuple[Action, ...]:
+    """chain neu setzen: jedes dd/ta direkt nach einem dd/ta."""
+    out = []
+    for action in program:
+        chain = action.op in MOTION_OPS and bool(out) and out[-1].op in MOTION_OPS
+        if chain != action.chain:
+            action = Action(action.op, action.args, action.src, chain)
+        out.append(action)
+    return tuple(out)
+
+
+def compile_tactic(phases: list[list[str]], color: str) -> tuple[Action, ...]:
+    """Alle Phasen einer Taktik zu einem flachen, unveränderlichen Programm kompilieren."""
+    if color not in COLORS:
+        raise TacticError(f"unbekannte Farbe '{color}'")
+    program = []
+    for p, phase in enumerate(phases):
+        for i, msg in enumerate(phase):
+            try:
+                action = _apply_color(parse_action(msg), color)
+            except TacticError as e:
+                raise TacticError(f"Phase {p}, Aktion {i} '{msg}': {e}") from None
+            program.append(action)
+    return _with_chain(program)
+
+
+def compile_tactics(tactics: dict[int, list[list[str]]]
+                    ) -> tuple[dict[tuple[int, str], tuple[Action, ...]], dict[int, str]]:
+    """Alle Taktiken für beide Farben kompilieren.
+
+    Liefert (programme, fehler): programme[(n, farbe)] und fehler[n] = Meldung
+    für jede Taktik, die sich nicht kompilieren lässt.
+    """
+    programs, errors = {}, {}
+    for n, phases in tactics.items():
+        try:
+            for color in COLORS:
+                programs[(n, color)] = compile_tactic(phases, color)
+        except TacticError as e:
+            programs.pop((n, COLORS[0]), None)
+            errors[n] = str(e)
+    return programs, errors
+
+
+# ── Optimierung ───────────────────────────────────────────────────────────
+
+def _fusable(a: Action, b: Action, fuse_reversals: bool) -> bool:
+    if a.op != b.op or a.op not in MOTION_OPS:
+        return False
+    if a.op == 'ta':
+        return True
+    # dd1900, dd-250 ist meist Absicht (an die Wand schieben, zurücksetzen)
+    return fuse_reversals or (a.args[0] >= 0) == (b.args[0] >= 0)
+
+
+def _wrap_deg(deg: int) -> int:
+    """Winkel auf (-180, 180] – kürzeste Drehung zum selben Ziel."""
+    return 180 - (180 - deg) % 360
+
+
+def optimize(program: tuple[Action, ...], fuse_reversals: bool = False,
+             notes: list[str] | None = None) -> tuple[Action, ...]:
+    """Fahrsegmente eines kompilierten Programms zusammenfassen.
+
+    - dd0/ta0 entfallen
+    - aufeinanderfolgende ta werden addiert und auf (-180°, 180°] gebracht, 0° entfällt
+    - aufeinanderfolgende dd gleicher Richtung werden addiert; Richtungswechsel
+      nur mit fuse_reversals, weil Vor-/Zurückfahren meist gewollt ist
+    - durch wegfallende Drehungen benachbarte Segmente werden weiter verschmolzen
+    - chain wird neu gesetzt, verbleibende dd/ta-Folgen laufen ohne Settle-Pause
+
+    notes sammelt optional eine Zeile pro Änderung für den Plan-Report.
+    """
+    out: list[Action] = []
+    skipped: list[str] = []   # entfallene Tokens seit out[-1] – gehören mit in dessen src
+    for action in program:
+        if action.op in MOTION_OPS and action.args[0] == 0:
+            if notes is not None:
+                notes.append(f"{action.src} → entfällt")
+            skipped.append(action.src)
+            continue
+        prev = out[-1] if out else None
+        if prev is None or not _fusable(prev, action, fuse_reversals):
+            out.append(action)
+            skipped = []
+            continue
+        total = prev.args[0] + action.args[0]
+        if action.op == 'ta':
+            total = _wrap_deg(total)   # ta350+ta20 → ta10, nicht eine volle Umdrehung extra
+        src = '+'.join([prev.src, *skipped, action.src])
+        skipped = []
+        out.pop()
+        if total == 0:
+            if notes is not None:
+                notes.append(f"{src} → entfällt")
+            skipped.append(src)
+            continue
+        fused = Action(action.op, (total,), src)
+        if notes is not None:
+            notes.append(f"{src} → {action.op}{total}")
+        out.append(fused)
+    return _with_chain(out)
+
+
+ROUNDTRIP_S = 0.02   # s  Befehl senden + Quittung empfangen (geschätzt)
+# Feste Wartezeiten innerhalb der Aktion (Task.CO_GRIP_WAIT, Task.IC_CAMERA_WAIT, Gripper.HOME_SETTLE)
+_WAIT_S = {'co': 1.0, 'ic': 1.0, 'hg': 1.0}
+
+
+def estimate_time(program: tuple[Action, ...], settle: dict[str, float],
+                  settle_default: float) -> float:
+    """Grobe Laufzeit eines Programms in s (Fahrzeit, Rundläufe, Settle-Pausen).
+
+    dp/tt/hm/wt hängen von Pose bzw. Uhr ab und zählen nur mit ihrer Settle-Zeit.
+    """
+    total = 0.0
+    for i, action in enumerate(program):
+        if action.op == 'dd':
+            total += ESP32.motion_time(action.args[0] * ESP32.STEPS_PER_MM)
+        elif action.op == 'ta':
+            total += ESP32.motion_time(action.args[0] * ESP32.STEPS_PER_DEG)
+        total += _WAIT_S.get(action.op, 0.0)
+        if not action.chain:
+            total += ROUNDTRIP_S
+        chained_next = i + 1 < len(program) and program[i + 1].chain
+        if not chained_next:
+            total += settle.get(action.op, settle_default)
+    return total
+
+
+def plan_report(program: tuple[Action, ...], settle: dict[str, float],
+                settle_default: float, fuse_reversals: bool = False) -> list[str]:
+    """Dry-Run: was optimize() ändern würde und wie viel Zeit das spart."""
+    notes: list[str] = []
+    optimized = optimize(program, fuse_reversals, notes)
+    before = estimate_time(program, settle, settle_default)
+    after = estimate_time(optimized, settle, settle_default)
+    lines = [f"{len(program)} → {len(optimized)} Aktionen, "
+             f"~{before:.1f} s → ~{after:.1f} s (−{before - after:.1f} s)"]
+    lines += [f"  {n}" for n in notes] or ["  nichts zu optimieren"]
+    return lines
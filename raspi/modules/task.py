@@ -1,98 +1,87 @@
 import asyncio
 import logging
 import os
-from time import time, sleep
+from time import time
 from typing import Self
 
 from modules.esp32 import ESP32
 from modules.camera import Camera
 from modules.gripper import Gripper
 from modules.lidar import Lidar
-
-
-def _mirror(x: int, y: int, theta: int | None = None):
-    """Spiegelt Koordinaten für das gelbe Team (x-Achse, Mitte = 1500mm)."""
-    mx = 3000 - x
-    if theta is not None:
-        mt = int((180 - theta) % 360)
-        return mx, y, mt
-    return mx, y
+from modules.tactic import Action, MOTION_OPS, compile_tactic
 
 
 class Task:
+    # Wartezeit nach einer Aktion (s), damit Servos/Fahrwerk zur Ruhe kommen.
+    # Reine Buchhaltung (sp, gp, st, ip, …) braucht keine – nicht gelistet = SETTLE_DEFAULT.
+    SETTLE_DEFAULT = 0.3
+    SETTLE: dict[str, float] = {
+        'dd': 0.1, 'ta': 0.1, 'dp': 0.1, 'tt': 0.1,   # ESP32 quittiert erst im Stillstand
+        'hm': 0.0, 'he': 0.0,
+        'hg': 0.0,                                     # Gripper.home wartet selbst
+        'sp': 0.0, 'gp': 0.0, 'es': 0.0, 'st': 0.0, 'wt': 0.0, 'ip': 0.0, 'ic': 0.0,
+    }
+    # Servo-Aktionen: Settle ist nur die Obergrenze – mit Servo-Telemetrie geht es
+    # weiter, sobald alle bewegten Servos STS_MOVING = 0 melden
+    _SERVO_OPS = frozenset({'co', 'cg', 'gr', 'go', 'gi', 'ga', 'gd', 'lh', 'lr', 'w1', 'w2', 'ws'})
+    CO_GRIP_WAIT   = 1.0   # s  co: Greifer schließen, bevor die Kamera schaut
+    IC_CAMERA_WAIT = 1.0   # s  ic: Stapel ruhig, bevor die Kamera zählt
+    # Kamera hochtakten, sobald eine Kamera-Aktion in den nächsten Aktionen kommt
+    CAMERA_OPS       = frozenset({'co', 'cg', 'ic'})
+    CAMERA_LOOKAHEAD = 3
+
     def __init__(self, esp32: ESP32, camera: Camera, gripper: Gripper,
-                 action_set: list[list[str]], color: str, lidar: Lidar | None = None):
+                 action_set: list[list[str]] | tuple[Action, ...], color: str,
+                 lidar: Lidar | None = None, settle: dict[str, float] | None = None):
         self.esp32   = esp32
         self.camera  = camera
         self.gripper = gripper
         self.lidar   = lidar
         self.color   = color  # 'blue' | 'yellow'
+        self.settle  = {**self.SETTLE, **(settle or {})}
 
-        self.action_set      = action_set
-        self.initial_actions = self.action_set[0]
-        self.actions         = self.action_set.pop(0)
+        # Fertiges Programm (compile_tactic) oder rohe Phasen-Listen → hier kompilieren
+        if isinstance(action_set, tuple):
+            self.program = action_set
+        else:
+            self.program = compile_tactic(action_set, color)
+        self.pc = 0   # Index der nächsten Aktion
 
         self.points = 0
         self.logger = logging.getLogger(__name__)
         self._cam_positions: list[int] = []
         self._t0: float | None = None
 
-    def next_task(self):
-        self.initial_actions = self.action_set[0]
-        self.actions         = self.action_set.pop(0)
-
-    def _pt(self, x: int, y: int, theta: int | None = None):
-        if self.color == 'blue':
-            return _mirror(x, y, theta)
-        return (x, y, theta) if theta is not None else (x, y)
-
-    def _angle(self, deg: int) -> int:
-        return -deg if self.color == 'blue' else deg
-
     # ------------------------------------------------------------------
     # Action dispatch
     # ------------------------------------------------------------------
 
-    async def perform_action(self, msg: str):
-        cmd = msg[:2]
+    async def perform_action(self, action: Action):
+        # Argumente sind schon geparst und für die Teamfarbe gespiegelt (modules/tactic.py)
+        args = action.args
 
-        match cmd:
+        match action.op:
             case 'dd':  # drive distance mm
-                dist = int(msg[2:])
-                await self.esp32.drive_distance(dist, self.lidar)
+                await self.esp32.drive_distance(args[0], self.lidar)
 
             case 'dp':  # drive to point  x;y[;theta]
-                vals = msg[2:].split(';')
-                x, y = int(vals[0]), int(vals[1])
-                theta = int(vals[2]) if len(vals) >= 3 else None
-                if theta is not None:
-                    px, py, pt = self._pt(x, y, theta)
-                    await self.esp32.drive_to(px, py, self.lidar)
-                    await self.esp32.turn_to(pt, self.lidar)
-                else:
-                    px, py = self._pt(x, y)
-                    await self.esp32.drive_to(px, py, self.lidar)
+                await self.esp32.drive_to(args[0], args[1], self.lidar)
+                if len(args) == 3:
+                    await self.esp32.turn_to(args[2], self.lidar)
 
             case 'ta':  # turn angle relative degrees
-                await self.esp32.turn_angle(self._angle(int(msg[2:])), self.lidar)
+                await self.esp32.turn_angle(args[0], self.lidar)
 
             case 'tt':  # turn to absolute degrees
-                theta = int(msg[2:])
-                if self.color == 'blue':
-                    _, __, theta = _mirror(0, 0, theta)
-                await self.esp32.turn_to(theta, self.lidar)
+                await self.esp32.turn_to(args[0], self.lidar)
 
             case 'sp':  # set odometry  x;y;theta
-                vals = msg[2:].split(';')
-                x, y, t = int(vals[0]), int(vals[1]), int(vals[2])
-                if self.color == 'blue':
-                    x, y, t = _mirror(x, y, t)
-                self.esp32.set_pos(x, y, t)
+                self.esp32.set_pos(*args)
 
             case 'gp':  # print current position
                 print(f"pos: {self.esp32.x:.0f}, {self.esp32.y:.0f}, {self.esp32.theta:.1f}")
 
-            case 'es':  # emergency stop
+            case 'es':  # emergency stop – CL: Fahrt abbrechen, wartende Segmente verwerfen
                 await self.esp32.set_stop()
 
             case 'hm':  # autonomous wall homing
@@ -119,34 +108,31 @@ class Task:
                 await self.esp32.home_endstop()
 
             case 'hg':  # home gripper
-                self.gripper.home()
+                await self.gripper.home()
                 if self.lidar:
                     self.lidar.arms_up = False
 
             case 'co':  # camera open – öffnet die Greifer an den Positionen der eigenen Kistchen
+                since = self.camera.generation if self.camera else 0
                 self.gripper.greifen()
-                sleep(1.0)
-                _GRIPPER_FUNCS = [
-                    lambda: self.gripper.servos.grip_links_aussen(1),
-                    lambda: self.gripper.servos.grip_links_innen(1),
-                    lambda: self.gripper.servos.grip_rechts_innen(1),
-                    lambda: self.gripper.servos.grip_rechts_aussen(1),
-                ]
+                await self.gripper.settle(self.CO_GRIP_WAIT)
                 _NAMEN = ['links-außen', 'links-innen', 'rechts-innen', 'rechts-außen']
                 if self.camera:
                     import cv2
+                    # Entscheidung aus mehreren Bildern im Stand (Tracker-Fenster), nicht aus einem
+                    if not await self.camera.collect(since):
+                        self.logger.warning("[CAM] zu wenige frische Bilder – nehme, was da ist")
                     frame = self.camera.get_latest_frame()
                     if frame is not None:
                         desktop = '/home/eurobot/Desktop'
                         os.makedirs(desktop, exist_ok=True)
                         path = f'{desktop}/co_{int(time())}.jpg'
-                        cv2.imwrite(path, frame)
+                        await asyncio.to_thread(cv2.imwrite, path, frame)
                         self.logger.info(f"[CAM] Bild gespeichert: {path}")
                 positions = self.camera.get_gripper_positions(self.color) if self.camera else []
                 self._cam_positions = [p for p in positions if 0 <= p < 4]
                 if self._cam_positions:
-                    for p in self._cam_positions:
-                        _GRIPPER_FUNCS[p]()
+                    self.gripper.servos.grip(self._cam_positions, 1)
                     gr = ', '.join(_NAMEN[p] for p in self._cam_positions)
                     self.logger.info(f"[GR] auf: {gr}")
                 else:
@@ -154,14 +140,8 @@ class Task:
                     self.logger.info("[GR] keine Kistchen sichtbar → alle Greifer auf")
 
             case 'cg':  # camera grab – schließt nur Greifer aus vorherigem co
-                _CLOSE_FUNCS = [
-                    lambda: self.gripper.servos.grip_links_aussen(2),
-                    lambda: self.gripper.servos.grip_links_innen(2),
-                    lambda: self.gripper.servos.grip_rechts_innen(2),
-                    lambda: self.gripper.servos.grip_rechts_aussen(2),
-                ]
-                for p in self._cam_positions:
-                    _CLOSE_FUNCS[p]()
+                if self._cam_positions:
+                    self.gripper.servos.grip(self._cam_positions, 2)
                 self.logger.info(f"[CG] zu: {self._cam_positions}")
 
             case 'gr':  # greifer zu
@@ -184,7 +164,7 @@ class Task:
                 self.logger.info(f"Timer gesetzt: t0={self._t0:.1f}")
 
             case 'wt':  # wait until N seconds since last st  wtN
-                secs = float(msg[2:])
+                secs = args[0]
                 if self._t0 is None:
                     self.logger.warning("wt: kein t0 gesetzt (st fehlt), warte trotzdem")
                     await asyncio.sleep(secs)
@@ -208,20 +188,21 @@ class Task:
                     self.lidar.arms_up = False
 
             case 'w1':
-                self.gripper.winker(1, msg == 'w1h')
+                self.gripper.winker(1, args[0])
 
             case 'w2':
-                self.gripper.winker(2, msg == 'w2h')
+                self.gripper.winker(2, args[0])
 
             case 'ws':  # write servo manually  id;pos
-                vals = msg[2:].split(';')
-                self.gripper.servos.write_servo(int(vals[0]), int(vals[1]))
+                self.gripper.servos.write_servo(*args)
 
             case 'ip':  # increase points by fixed amount
-                self.points += int(msg[2:])
+                self.points += args[0]
 
             case 'ic':  # increase points via camera stack detection
-                sleep(1)
+                await asyncio.sleep(self.IC_CAMERA_WAIT)
+                if self.camera:
+                    await self.camera.fresh()
                 stacks = self.camera.check_stacks() if self.camera else 0
                 match stacks:
                     case 1: self.points += 4
@@ -229,17 +210,64 @@ class Task:
                     case 3: self.points += 28
 
             case _:
-                self.logger.info(f"Unknown action: {msg}")
+                self.logger.info(f"Unknown action: {action}")
+
+    def _camera_lookahead(self):
+        """Kommt bald co/cg/ic, die Kamera schon während der Anfahrt schnell erkennen lassen."""
+        if not self.camera:
+            return
+        upcoming = self.program[self.pc - 1:self.pc - 1 + self.CAMERA_LOOKAHEAD]
+        if any(a.op in self.CAMERA_OPS for a in upcoming):
+            self.camera.burst()
+
+    async def _run_motions(self, first: Action):
+        """Aufeinanderfolgende dd/ta (Action.chain) gemeinsam senden und die Quittungen abwarten.
+
+        Der ESP32 hält bis zu ESP32.WINDOW Befehle in seiner cmdQueue und fährt
+        sie ohne Stillstand zwischen den Segmenten ab. Wird ein Segment abgebrochen
+        (INTERRUPTED), liefert sie None und die Taktik endet.
+        """
+        end = self.pc
+        while end < len(self.program) and self.program[end].chain:
+            end += 1
+        segments = (first,) + self.program[self.pc:end]
+        self.pc = end
+
+        pending = []
+        for action in segments:
+            self.logger.info(f"Action: {action}" + (" (pipelined)" if len(segments) > 1 else ""))
+            if action.op == 'dd':
+                pending.append(await self.esp32.queue_drive(action.args[0], self.lidar))
+            else:
+                pending.append(await self.esp32.queue_turn(action.args[0], self.lidar))
+        results = await asyncio.gather(*pending)
+        if not all(results):
+            # Folgende Aktionen sind von der Zielpose aus geplant – nicht blind weiterfahren
+            failed = segments[results.index(False)]
+            self.logger.warning(f"Fahrt abgebrochen bei {failed} – Taktik gestoppt")
+            self.pc = len(self.program)
+            return None
+        return segments[-1]
 
     async def run(self) -> Self | None:
-        if len(self.actions) <= 0:
-            if len(self.action_set) <= 0:
+        if self.pc >= len(self.program):
+            return None
+
+        action = self.program[self.pc]
+        self.pc += 1
+        self._camera_lookahead()
+        if action.op in MOTION_OPS:
+            action = await self._run_motions(action)
+            if action is None:
                 return None
-            self.next_task()
-
-        action = self.actions.pop(0)
-        self.logger.info(f"Action: {action}")
-        await self.perform_action(action)
-        sleep(0.3)
+        else:
+            self.logger.info(f"Action: {action}")
+            await self.perform_action(action)
+
+        settle = self.settle.get(action.op, self.SETTLE_DEFAULT)
+        if settle > 0 and action.op in self._SERVO_OPS:
+            await self.gripper.settle(settle)
+        elif settle > 0:
+            await asyncio.sleep(settle)
 
         return self
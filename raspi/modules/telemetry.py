@@ -0,0 +1,189 @@
+"""
+Telemetrie-Kanal: binäre Status-Frames für beliebig viele Zuhörer (TCP :5002).
+
+Neben der Text-Konsole auf :5001 (ein Client, Befehle) schickt der Roboter hier
+mit fester Rate einen Frame pro Takt an alle verbundenen Clients – nur lesen,
+keine Befehle. Jeder Client hat genau einen Platz für den nächsten Frame: kommt
+er mit dem Lesen nicht nach, wird der ältere Frame verworfen statt gepuffert.
+Ein hängender Laptop bremst so weder den Controller noch die anderen Clients.
+
+Frame auf der Leitung: uint32 Länge (little-endian), danach der Inhalt:
+    HEADER                          Version, Zustand, Pose, Lidar, Anzahlen
+    SERVO × n_servos                id, Position, Speed, Last, Spannung, Temp, Moving, Fehler, Alter
+    TAG   × n_tags                  id, Winkel (°), Distanz (mm)
+decode() macht daraus wieder ein dict (siehe telemetry_view.py).
+"""
+
+import asyncio
+import logging
+import struct
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import Callable
+
+VERSION = 1
+
+LENGTH = struct.Struct('<I')
+HEADER = struct.Struct('<BB8sIdfffIHBB')   # version, flags, state, seq, stamp, x, y, θ, scan, hits, n_servos, n_tags
+SERVO  = struct.Struct('<BhhhBBBBH')       # id, pos, speed, load, volt (0.1 V), temp, moving, error, age (ms)
+TAG    = struct.Struct('<Bff')             # id, horizontal_angle, distance
+
+# Bits in HEADER.flags
+F_YELLOW     = 0x01
+F_LIDAR_OK   = 0x02
+F_LIDAR_STOP = 0x04
+F_PULLCORD   = 0x08   # Zugschnur gezogen
+
+
+def encode(seq: int, state: str, flags: int, pose: tuple[float, float, float],
+           scan_seq: int, hits: int, servos=None, tags=()) -> bytes:
+    """Einen Frame (mit Längenpräfix) bauen. servos: ServoSnapshot oder None, tags: TagDetection-Liste."""
+    now = monotonic()
+    parts = []
+    if servos is not None:
+        for sid, row, stamp in zip(servos.ids, servos.data.tolist(), servos.stamp.tolist()):
+            age = min(65535, int((now - stamp) * 1000)) if stamp else 65535
+            pos, speed, load, volt, temp, moving, error = row
+            parts.append(SERVO.pack(sid, pos, speed, load, volt, temp, moving, error, age))
+    n_servos = len(parts)
+    for t in tags:
+        parts.append(TAG.pack(t.id, t.horizontal_angle, t.distance))
+    head = HEADER.pack(VERSION, flags, state.encode()[:8], seq & 0xFFFFFFFF, now, *pose,
+                       scan_seq & 0xFFFFFFFF, min(hits, 65535), n_servos, len(tags))
+    body = head + b''.join(parts)
+    return LENGTH.pack(len(body)) + body
+
+
+def decode(body: bytes) -> dict:
+    """Inhalt eines Frames (ohne Längenpräfix) → dict."""
+    (version, flags, state, seq, stamp, x, y, theta,
+     scan_seq, hits, n_servos, n_tags) = HEADER.unpack_from(body)
+    if version != VERSION:
+        raise ValueError(f"Telemetrie-Version {version}, erwartet {VERSION}")
+    off = HEADER.size
+    servos = []
+    for _ in range(n_servos):
+        sid, pos, speed, load, volt, temp, moving, error, age = SERVO.unpack_from(body, off)
+        servos.append({'id': sid, 'pos': pos, 'speed': speed, 'load': load, 'volt': volt / 10,
+                       'temp': temp, 'moving': bool(moving), 'error': error, 'age_ms': age})
+        off += SERVO.size
+    tags = []
+    for _ in range(n_tags):
+        tid, angle, distance = TAG.unpack_from(body, off)
+        tags.append({'id': tid, 'angle': angle, 'distance': distance})
+        off += TAG.size
+    return {
+        'seq': seq, 'stamp': stamp, 'state': state.rstrip(b'\0').decode(),
+        'team': 'yellow' if flags & F_YELLOW else 'blue',
+        'pose': (x, y, theta),
+        'lidar': {'ok': bool(flags & F_LIDAR_OK), 'stop': bool(flags & F_LIDAR_STOP),
+                  'scan': scan_seq, 'hits': hits},
+        'pullcord': bool(flags & F_PULLCORD),
+        'servos': servos, 'tags': tags,
+    }
+
+
+async def read_frame(reader: asyncio.StreamReader) -> dict:
+    """Nächsten Frame vom Stream lesen (IncompleteReadError am Ende)."""
+    (length,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+    return decode(await reader.readexactly(length))
+
+
+@dataclass(eq=False)
+class _Subscriber:
+    writer: asyncio.StreamWriter
+    addr: object
+    pending: bytes | None = None
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
+    sent: int = 0
+    dropped: int = 0
+
+    def offer(self, frame: bytes):
+        if self.pending is not None:
+            self.dropped += 1   # Client hat den letzten noch nicht abgeholt → veraltet
+        self.pending = frame
+        self.ready.set()
+
+
+class TelemetryServer:
+    PORT = 5002
+    RATE = 10.0   # Hz
+
+    def __init__(self, sample: Callable[[int], bytes], host: str = '127.0.0.1',
+                 port: int = PORT, rate: float = RATE):
+        """sample(seq) liefert den fertigen Frame (encode()) – wird nur mit Zuhörern aufgerufen."""
+        self.sample = sample
+        self.host = host
+        self.port = port
+        self.rate = rate
+        self.logger = logging.getLogger(__name__)
+        self.subscribers: set[_Subscriber] = set()
+        self._seq = 0
+        self._server: asyncio.AbstractServer | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self._task = asyncio.create_task(self._broadcast_loop())
+        self.logger.info(f"Telemetrie auf {self.host}:{self.port} ({self.rate:g} Hz)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        if self._server:
+            self._server.close()
+        for sub in list(self.subscribers):
+            sub.writer.close()
+
+    def stats(self) -> list[tuple[object, int, int]]:
+        """(Adresse, gesendet, verworfen) je Client."""
+        return [(s.addr, s.sent, s.dropped) for s in self.subscribers]
+
+    async def _broadcast_loop(self):
+        period = 1.0 / self.rate
+        next_tick = monotonic()
+        while True:
+            next_tick += period
+            if self.subscribers:
+                self._seq += 1
+                try:
+                    frame = self.sample(self._seq)
+                except Exception as e:
+                    self.logger.error(f"Telemetrie-Frame fehlgeschlagen: {e}")
+                else:
+                    for sub in self.subscribers:
+                        sub.offer(frame)
+            delay = next_tick - monotonic()
+            if delay < 0:   # hinterher (z.B. Loop blockiert) – nicht nachholen
+                next_tick, delay = monotonic(), 0
+            await asyncio.sleep(delay)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        sub = _Subscriber(writer, writer.get_extra_info('peername'))
+        self.subscribers.add(sub)
+        self.logger.info(f"Telemetrie-Client verbunden: {sub.addr} ({len(self.subscribers)} aktiv)")
+        sender = asyncio.create_task(self._send_loop(sub))
+        try:
+            while await reader.read(256):   # Eingaben ignorieren, nur auf Trennung warten
+                pass
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        finally:
+            self.subscribers.discard(sub)
+            sender.cancel()
+            writer.close()
+            self.logger.info(f"Telemetrie-Client getrennt: {sub.addr} "
+                             f"({sub.sent} gesendet, {sub.dropped} verworfen)")
+
+    @staticmethod
+    async def _send_loop(sub: _Subscriber):
+        try:
+            while True:
+                await sub.ready.wait()
+                sub.ready.clear()
+                frame, sub.pending = sub.pending, None
+                sub.writer.write(frame)
+                await sub.writer.drain()   # wartet nur auf diesen einen Client
+                sub.sent += 1
+        except (ConnectionError, asyncio.CancelledError):
+            pass
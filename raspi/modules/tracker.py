@@ -0,0 +1,111 @@
+"""
+Kistchen-Tracker: Detektionen über mehrere Bilder zu stabilen Spuren verbinden.
+
+Spuren werden über die Lage (Winkel + Distanz) zugeordnet, nicht über die
+Marker-ID – zwei blaue Kistchen (beide ID 36) bleiben so zwei Spuren. Jede Spur
+merkt sich die letzten WINDOW Bilder: Konfidenz = Anteil der Bilder, in denen
+sie gesehen wurde, Tag-ID = Mehrheit in diesem Fenster. Ein einzelnes
+verpasstes oder falsch gelesenes Bild kippt damit keine Greifer-Zuordnung mehr.
+"""
+
+import itertools
+from collections import Counter, deque
+from dataclasses import dataclass, field
+
+
+@dataclass
+class Track:
+    id: int                  # laufende Nummer, nur für Logs
+    angle: float             # Grad, geglättet, positiv = rechts
+    distance: float          # mm, geglättet
+    last_seen: float         # monotonic() des letzten Treffers
+    history: deque = field(repr=False)   # Tag-ID je Bild, None = nicht gesehen
+
+    @property
+    def hits(self) -> int:
+        return sum(t is not None for t in self.history)
+
+    @property
+    def tag_id(self) -> int | None:
+        votes = Counter(t for t in self.history if t is not None)
+        return votes.most_common(1)[0][0] if votes else None
+
+
+class CrateTracker:
+    WINDOW         = 8       # Bilder
+    GATE_DEG       = 6.0     # max. Winkelabstand Detektion ↔ Spur
+    GATE_MM        = 150.0   # max. Distanzabstand Detektion ↔ Spur
+    SMOOTHING      = 0.5     # Gewicht der neuen Messung
+    MIN_CONFIDENCE = 0.5     # darunter wird für eine Spur kein Greifer geöffnet
+    MIN_HITS       = 2       # ab so vielen Treffern im Fenster zählt eine Spur für die Reihenfolge
+    GRIPPERS       = 4
+
+    def __init__(self):
+        self.tracks: list[Track] = []
+        self.frames = 0                  # Bilder seit reset()
+        self._ids = itertools.count(1)
+
+    def reset(self):
+        self.tracks = []
+        self.frames = 0
+
+    def update(self, tags, stamp: float):
+        """Ein Bild einarbeiten. tags: TagDetection-Liste (id, horizontal_angle, distance)."""
+        self.frames += 1
+        # Greedy nach Abstand – bei ≤ 4 Kistchen reicht das, kein Hungarian nötig
+        pairs = []
+        for ti, track in enumerate(self.tracks):
+            for di, tag in enumerate(tags):
+                d_angle = abs(tag.horizontal_angle - track.angle)
+                d_dist = abs(tag.distance - track.distance)
+                if d_angle <= self.GATE_DEG and d_dist <= self.GATE_MM:
+                    pairs.append((d_angle / self.GATE_DEG + d_dist / self.GATE_MM, ti, di))
+        pairs.sort()
+
+        matched_tracks: dict[int, int] = {}
+        used_tags: set[int] = set()
+        for _, ti, di in pairs:
+            if ti in matched_tracks or di in used_tags:
+                continue
+            matched_tracks[ti] = di
+            used_tags.add(di)
+
+        a = self.SMOOTHING
+        for ti, track in enumerate(self.tracks):
+            di = matched_tracks.get(ti)
+            if di is None:
+                track.history.append(None)
+                continue
+            tag = tags[di]
+            track.angle += a * (tag.horizontal_angle - track.angle)
+            track.distance += a * (tag.distance - track.distance)
+            track.last_seen = stamp
+            track.history.append(tag.id)
+
+        for di, tag in enumerate(tags):
+            if di not in used_tags:
+                self.tracks.append(Track(next(self._ids), tag.horizontal_angle, tag.distance,
+                                         stamp, deque([tag.id], maxlen=self.WINDOW)))
+
+        self.tracks = [t for t in self.tracks if t.hits]
+
+    def confidence(self, track: Track) -> float:
+        """Anteil der Bilder im Fenster (solange es noch nicht voll ist: seit reset()), die track trafen."""
+        return track.hits / max(1, min(self.frames, self.WINDOW))
+
+    def confirmed(self, min_confidence: float = MIN_CONFIDENCE) -> list[Track]:
+        """Spuren ab min_confidence, von links nach rechts. Höchstens GRIPPERS (die sichersten)."""
+        tracks = [t for t in self.tracks if self.confidence(t) >= min_confidence]
+        tracks = sorted(tracks, key=lambda t: t.hits, reverse=True)[:self.GRIPPERS]
+        return sorted(tracks, key=lambda t: t.angle)
+
+    def gripper_positions(self, tag_id: int) -> list[int]:
+        """Greifer-Indizes (0=ganz links … 3=ganz rechts) der Kistchen mit tag_id.
+
+        Für die Reihenfolge zählt jede Spur ab MIN_HITS Treffern, damit ein kurz
+        verdecktes Kistchen die Indizes nicht verschiebt; geöffnet wird nur für
+        Spuren ab MIN_CONFIDENCE.
+        """
+        tracks = self.confirmed(self.MIN_HITS / self.WINDOW)
+        return [i for i, t in enumerate(tracks)
+                if t.tag_id == tag_id and self.confidence(t) >= self.MIN_CONFIDENCE]
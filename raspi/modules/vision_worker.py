@@ -0,0 +1,134 @@
+"""
+Vision-Worker: die komplette Kamera-Pipeline in einem eigenen Prozess.
+
+Der Kindprozess läuft auf einem eigenen Kern (CORE) und betreibt dort eine
+normale Camera – Aufnahme, Erkennung, Pose, alles ohne den GIL des
+Hauptprozesses (asyncio, Lidar, Servo-Bus). Pro Bild schickt er nur die
+Tags (id, Winkel, Distanz) über eine Pipe zurück; die Bilder liegen ohnehin im
+Frame-Store (Shared Memory) und werden erst bei get_latest_frame() gelesen.
+
+VisionWorker hat dieselbe Schnittstelle wie Camera (getTag, get_gripper_positions,
+burst, fresh, collect, get_latest_frame) und ist in main.py per --vision-process
+austauschbar.
+"""
+
+import logging
+import multiprocessing as mp
+import os
+import threading
+
+import numpy as np
+
+from modules.camera import Camera, TagDetection
+from modules.frame_store import FrameStore
+
+
+def _worker_main(conn, core: int | None, camera_kwargs: dict):
+    """Einstieg im Kindprozess: Camera starten, Tags senden, Befehle empfangen."""
+    logger = logging.getLogger(__name__)
+    if core is not None:
+        try:
+            os.sched_setaffinity(0, {core})
+        except (AttributeError, OSError) as e:
+            logger.warning(f"Vision-Worker: Kern {core} nicht verfügbar ({e})")
+
+    camera = Camera(**camera_kwargs)
+    camera.on_detect = lambda tags, stamp: conn.send(
+        (stamp, [(t.id, t.horizontal_angle, t.distance) for t in tags])
+    )
+    camera.start()
+    try:
+        while True:
+            cmd, arg = conn.recv()
+            if cmd == 'burst':
+                camera.burst(arg)
+            elif cmd == 'stop':
+                break
+    except (EOFError, KeyboardInterrupt):
+        pass   # Hauptprozess weg bzw. Strg+C in der Konsole
+    finally:
+        camera.stop()
+        conn.close()
+
+
+class VisionWorker(Camera):
+    CORE = 3   # Pi 5: Kern 0–2 für asyncio, Lidar, Servo-Bus
+
+    def __init__(self, core: int | None = CORE, **camera_kwargs):
+        super().__init__(**camera_kwargs)
+        if self.share is None:
+            self.share = f"{FrameStore.DEFAULT_NAME}_{os.getpid()}"
+        self.core = core
+        self._camera_kwargs = {**camera_kwargs, 'share': self.share}
+        self._conn = None
+        self._send_lock = threading.Lock()
+        self.process: mp.Process | None = None
+
+    # --- modul-interface ---
+
+    def start(self):
+        # spawn statt fork: der Hauptprozess hat schon Threads (Servo-Bus, Lidar)
+        ctx = mp.get_context('spawn')
+        self._conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, name='vision',
+                                   args=(child, self.core, self._camera_kwargs), daemon=True)
+        self.process.start()
+        child.close()
+        self.running = True
+        self.thread = threading.Thread(target=self._receive_loop, name='vision-rx', daemon=True)
+        self.thread.start()
+        self.logger.info(f"Vision-Worker gestartet (PID {self.process.pid}, Kern {self.core})")
+
+    def stop(self):
+        self.running = False
+        self._command('stop')
+        if self.process:
+            self.process.join(timeout=3.0)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process = None
+        if self._conn:
+            self._conn.close()
+        if self.thread:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+        if self.frames:
+            self.frames.close()
+            self.frames = None
+        self.logger.info("Vision-Worker gestoppt")
+
+    def burst(self, duration: float = Camera.BURST_HOLD):
+        self._command('burst', duration)
+
+    def get_latest_frame(self) -> np.ndarray | None:
+        if self.frames is None:
+            try:
+                # Der Worker ist unser Kind und teilt den resource_tracker – nicht austragen
+                self.frames = FrameStore.attach(self.share, untrack=False)
+            except FileNotFoundError:
+                return None
+        return super().get_latest_frame()
+
+    # --- intern ---
+
+    def _wakeup(self):
+        self._command('burst', 0.0)   # burst(0) weckt nur auf
+
+    def _command(self, cmd: str, arg=None):
+        if self._conn is None:
+            return
+        with self._send_lock:
+            try:
+                self._conn.send((cmd, arg))
+            except (BrokenPipeError, OSError):
+                pass   # Worker schon beendet
+
+    def _receive_loop(self):
+        while self.running:
+            try:
+                stamp, raw_tags = self._conn.recv()
+            except (EOFError, OSError):
+                break
+            self._publish([TagDetection(*t) for t in raw_tags], stamp)
+        if self.running:
+            self.logger.error("Vision-Worker beendet sich unerwartet")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Telemetrie-Anzeige – liest den binären Status-Kanal von main.py (Port 5002).
+
+Nur lesen: beliebig viele Instanzen parallel zur Konsole (client.py), die
+Operator-Verbindung auf :5001 bleibt unberührt. Vom Laptop per SSH-Tunnel:
+    ssh -L 5002:127.0.0.1:5002 eurobot@<pi>
+    python3 raspi/telemetry_view.py
+
+Aufruf:
+    python3 raspi/telemetry_view.py [--host 127.0.0.1] [--port 5002]
+"""
+
+import argparse
+import asyncio
+
+from modules.telemetry import TelemetryServer, read_frame
+
+
+def _line(f: dict) -> str:
+    x, y, theta = f['pose']
+    lidar = f['lidar']
+    lid = ('STOP' if lidar['stop'] else 'ok') if lidar['ok'] else 'FEHLT'
+    servos = f['servos']
+    fresh = [s for s in servos if s['age_ms'] < 1000]
+    srv = (f"{len(fresh)}/{len(servos)} max {max(s['temp'] for s in fresh)}°C"
+           if fresh else 'keine')
+    tags = ' '.join(f"{t['id']}@{t['angle']:+.0f}°" for t in f['tags']) or '–'
+    return (f"#{f['seq']:<6} {f['state']:<8} {f['team']:<6} "
+            f"x={x:5.0f} y={y:5.0f} θ={theta:5.1f}°  "
+            f"lidar {lid} ({lidar['hits']} Pkt)  servos {srv}  tags {tags}")
+
+
+async def main():
+    p = argparse.ArgumentParser(description='Telemetrie von main.py anzeigen')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=TelemetryServer.PORT)
+    args = p.parse_args()
+
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    print(f"Verbunden mit {args.host}:{args.port}")
+    last_seq = None
+    try:
+        while True:
+            frame = await read_frame(reader)
+            if last_seq is not None and frame['seq'] != last_seq + 1:
+                print(f"  … {frame['seq'] - last_seq - 1} Frames verworfen (zu langsam gelesen)")
+            last_seq = frame['seq']
+            print(_line(frame))
+    except asyncio.IncompleteReadError:
+        print("Verbindung getrennt")
+    finally:
+        writer.close()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nBeendet")
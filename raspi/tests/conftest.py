@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Module werden wie in main.py als modules.* importiert (Arbeitsverzeichnis raspi/)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
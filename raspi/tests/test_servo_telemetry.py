@@ -0,0 +1,101 @@
+"""
+Servo-Telemetrie ohne Hardware: Loopback-Port statt Bus.
+
+Prüft, dass ServoTelemetry nur Servos als frisch stempelt, die im aktuellen
+Sync-Read-Zyklus geantwortet haben – bei totem Bus oder fehlendem Servo
+bleibt stamp stehen und wait_reached() meldet kein falsches "steht". Ebenso
+zählt ein Zyklus direkt nach dem Befehl, bevor der Servo angelaufen ist, nicht.
+
+Aufruf (aus dem Repo-Root):
+    python3 -m pytest raspi/tests
+"""
+
+import asyncio
+import struct
+import time
+
+from modules.STservo_sdk import *
+from modules.servos import ServoTelemetry
+from servo_codec_bench import IDS, LoopbackPort, _status
+
+
+def _telemetry(replies: dict[int, bytes]) -> tuple[LoopbackPort, ServoTelemetry]:
+    port = LoopbackPort()
+    port.replies = replies
+    telemetry = ServoTelemetry(sts(port), bus=None, ids=IDS)   # poll_once() direkt, ohne Bus-Thread
+    return port, telemetry
+
+
+def _sync_reply(ids, pos: int = 0, moving: bool = False) -> dict[int, bytes]:
+    # Adresse 56–66: Position, Speed, Last, Spannung, Temperatur, 2 Byte Reserve, Moving
+    row = struct.pack('<Hhh', pos, 0, 0) + bytes([120, 30, 0, 0, int(moving)])
+    return {INST_SYNC_READ: b''.join(_status(i, row) for i in ids)}
+
+
+def _wait(telemetry: ServoTelemetry, port: LoopbackPort, replies: list[dict[int, bytes]],
+          goals: dict[int, int] | None = None, timeout: float = 0.2) -> bool:
+    """wait_reached() starten und danach je Zyklus die nächste Antwort aus replies liefern."""
+    telemetry.running = True
+
+    async def run():
+        waiter = asyncio.create_task(telemetry.wait_reached(IDS, timeout, goals))
+        for reply in replies:
+            await asyncio.sleep(0.01)
+            port.replies = reply
+            telemetry.poll_once()
+        return await waiter
+
+    return asyncio.run(run())
+
+
+def test_dead_bus_keeps_stamp():
+    port, telemetry = _telemetry(_sync_reply(IDS))
+    telemetry.poll_once()
+    first = telemetry.snapshot().stamp
+    assert all(first > 0)
+
+    port.replies = {}   # Bus tot: keine Antwort mehr
+    time.sleep(0.01)
+    telemetry.poll_once()
+    assert (telemetry.snapshot().stamp == first).all()
+
+
+def test_missing_servo_keeps_stamp():
+    port, telemetry = _telemetry(_sync_reply(IDS))
+    telemetry.poll_once()
+    first = telemetry.snapshot().stamp
+
+    missing = IDS[3]
+    port.replies = _sync_reply(i for i in IDS if i != missing)
+    time.sleep(0.01)
+    telemetry.poll_once()
+    stamp = telemetry.snapshot().stamp
+    for i, sid in enumerate(IDS):
+        assert (stamp[i] == first[i]) if sid == missing else (stamp[i] > first[i]), sid
+
+
+def test_dead_bus_does_not_report_reached():
+    port, telemetry = _telemetry(_sync_reply(IDS))
+    telemetry.poll_once()
+    assert _wait(telemetry, port, [{}] * 5) is False
+
+
+def test_not_reached_before_servo_starts():
+    # Zyklen nach dem Befehl, Servo noch an der alten Position und STS_MOVING = 0
+    port, telemetry = _telemetry(_sync_reply(IDS))
+    goals = dict.fromkeys(IDS, 2048)
+    assert _wait(telemetry, port, [_sync_reply(IDS, pos=500)] * 5, goals) is False
+
+
+def test_reached_after_moving():
+    port, telemetry = _telemetry(_sync_reply(IDS))
+    goals = dict.fromkeys(IDS, 2048)
+    replies = [_sync_reply(IDS, pos=500), _sync_reply(IDS, pos=1200, moving=True),
+               _sync_reply(IDS, pos=1900)]   # z.B. am Kistchen blockiert, nicht ganz am Ziel
+    assert _wait(telemetry, port, replies, goals) is True
+
+
+def test_reached_when_already_at_goal():
+    port, telemetry = _telemetry(_sync_reply(IDS))
+    goals = dict.fromkeys(IDS, 2048)
+    assert _wait(telemetry, port, [_sync_reply(IDS, pos=2050)], goals) is True
@@ -0,0 +1,35 @@
+"""Taktik-Optimierer: Zusammenfassen von dd/ta-Folgen (modules/tactic.py)."""
+
+from modules.tactic import compile_tactic, estimate_time, optimize, plan_report
+
+
+def _optimized(*actions: str) -> list[str]:
+    program = compile_tactic([list(actions)], 'yellow')   # gelb: ta ungespiegelt
+    return [f"{a.op}{a.args[0]}" for a in optimize(program)]
+
+
+def test_fused_turns_wrap_to_shortest():
+    assert _optimized('ta350', 'ta20') == ['ta10']
+    assert _optimized('ta270', 'ta180') == ['ta90']
+    assert _optimized('ta-170', 'ta-20') == ['ta170']
+    assert _optimized('ta90', 'ta90') == ['ta180']
+    assert _optimized('ta-90', 'ta-90') == ['ta180']
+
+
+def test_full_turn_is_dropped():
+    assert _optimized('dd100', 'ta300', 'ta60', 'dd50') == ['dd150']
+    assert _optimized('ta180', 'ta180', 'ta90') == ['ta90']
+
+
+def test_fused_src_keeps_all_tokens():
+    program = compile_tactic([['dd100', 'ta90', 'dd0', 'ta-90', 'dd50']], 'yellow')
+    (fused,) = optimize(program)
+    assert (fused.op, fused.args, fused.src) == ('dd', (150,), 'dd100+ta90+dd0+ta-90+dd50')
+
+
+def test_estimate_uses_wrapped_turn():
+    settle = {'ta': 0.1}
+    program = compile_tactic([['ta350', 'ta20']], 'yellow')
+    single = compile_tactic([['ta10']], 'yellow')
+    assert estimate_time(optimize(program), settle, 0.3) == estimate_time(single, settle, 0.3)
+    assert any('→ ta10' in line for line in plan_report(program, settle, 0.3))